@@ -4,7 +4,16 @@ RAG Demo CLI - Simple command-line interface for all operations
 Using Click for clean, demo-friendly CLI
 """
 
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
 import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from functools import cache
 from pathlib import Path
 
 import click
@@ -17,54 +26,108 @@ load_dotenv()
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from conversation import ConversationManager
+from conversation import ConversationManager, format_timestamp
 from document_processor import DocumentProcessor
 from embeddings import EmbeddingModel
 from rag import RAGSystem
 from reranker import Reranker
+from retrieval_cache import RetrievalCache
 from vector_store import VectorStore
 
 
-# Global configuration
-class Config:
-    """Shared configuration"""
+# Daemon mode: `serve` keeps components loaded and runs commands sent over this socket
+DAEMON_SOCKET = os.getenv("RAG_DAEMON_SOCKET", os.path.join(tempfile.gettempdir(), "ragdemo.sock"))
+DAEMON_COMMANDS = frozenset({"process-pdf", "ingest", "ingest-dir", "list-docs", "query", "search"})
 
-    def __init__(self):
-        self.embedding_model = None
-        self.vector_store = None
-        self.reranker = None
-        self.conversation_manager = None
-        self.rag_system = None
 
+# Lazily created, process-wide components: each command only builds what it uses
+@cache
+def get_embedder() -> EmbeddingModel:
+    """Shared embedding model"""
+    return EmbeddingModel()
 
-config = Config()
 
+@cache
+def get_vector_store() -> VectorStore:
+    """Shared vector store"""
+    return VectorStore()
 
-def init_components(use_reranker: bool = False):
-    """Lazy initialization of components"""
-    if not config.embedding_model:
-        config.embedding_model = EmbeddingModel()
 
-    if not config.vector_store:
-        config.vector_store = VectorStore()
+@cache
+def get_reranker() -> Reranker:
+    """Shared reranker model"""
+    return Reranker()
 
-    if use_reranker and not config.reranker:
-        config.reranker = Reranker()
 
-    if not config.conversation_manager:
+@cache
+def get_conversation_manager() -> ConversationManager | None:
+    """Shared Redis conversation manager (None if unavailable)"""
+    try:
+        return ConversationManager()
+    except Exception as e:
+        click.echo(f"Warning: Could not connect to Redis: {e}", err=True)
+        return None
+
+
+@cache
+def get_retrieval_cache() -> RetrievalCache:
+    """Shared Redis retrieval cache (Redis errors are treated as cache misses)"""
+    return RetrievalCache()
+
+
+@cache
+def _rag_system() -> RAGSystem:
+    return RAGSystem(
+        embedding_model=get_embedder(),
+        vector_store=get_vector_store(),
+        conversation_manager=get_conversation_manager(),
+        retrieval_cache=get_retrieval_cache(),
+    )
+
+
+def get_rag_system(use_reranker: bool = False) -> RAGSystem:
+    """Shared RAG system built from the other components
+
+    A single instance serves every option (they all share its answer cache),
+    the reranker model is attached the first time reranking is requested.
+    """
+    rag_system = _rag_system()
+    if use_reranker and rag_system.reranker is None:
+        rag_system.reranker = get_reranker()
+    return rag_system
+
+
+def _embed_unique(texts: list[str], show_progress: bool = True):
+    """Embed texts, running the model only once per distinct text"""
+    seen: dict[bytes, int] = {}
+    unique_texts = []
+    idx = []
+    for text in texts:
+        h = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        j = seen.get(h)
+        if j is None:
+            j = seen[h] = len(unique_texts)
+            unique_texts.append(text)
+        idx.append(j)
+
+    if len(unique_texts) < len(texts):
+        click.echo(f"   Skipping {len(texts) - len(unique_texts)} duplicate chunks")
+
+    unique_embeddings = get_embedder().embed_documents(unique_texts, show_progress=show_progress)
+    return unique_embeddings[idx]
+
+
+def _send_to_daemon(args: list[str], socket_path: str = DAEMON_SOCKET):
+    """Run a CLI command in the `serve` daemon and stream its output"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
         try:
-            config.conversation_manager = ConversationManager()
-        except Exception as e:
-            click.echo(f"Warning: Could not connect to Redis: {e}", err=True)
-            config.conversation_manager = None
-
-    if not config.rag_system:
-        config.rag_system = RAGSystem(
-            embedding_model=config.embedding_model,
-            vector_store=config.vector_store,
-            conversation_manager=config.conversation_manager,
-            reranker=config.reranker,
-        )
+            sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise click.ClickException("daemon not running; start it with `serve`") from e
+        sock.sendall(json.dumps({"args": args}).encode("utf-8") + b"\n")
+        with sock.makefile("r", encoding="utf-8") as reader:
+            for line in reader:
+                click.echo(line, nl=False)
 
 
 @click.group()
@@ -87,11 +150,22 @@ def init_db(vector_size):
 @click.argument("pdf_path", type=click.Path(exists=True))
 @click.option("--chunk-size", default=512, help="Chunk size in characters")
 @click.option("--chunk-overlap", default=50, help="Overlap between chunks")
-def process_pdf(pdf_path, chunk_size, chunk_overlap):
+@click.option("--ocr/--no-ocr", default=False, help="Run OCR on scanned pages")
+@click.option("--tables/--no-tables", default=False, help="Recover table structure")
+@click.option("--via-daemon", is_flag=True, help="Run in the `serve` daemon (models already loaded)")
+def process_pdf(pdf_path, chunk_size, chunk_overlap, ocr, tables, via_daemon):
     """Extract and display chunks from a PDF"""
+    if via_daemon:
+        _send_to_daemon(
+            ["process-pdf", str(Path(pdf_path).resolve()), *_pdf_options(chunk_size, chunk_overlap, ocr, tables)]
+        )
+        return
+
     click.echo(f"Processing PDF: {pdf_path}")
 
-    processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    processor = DocumentProcessor(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, do_ocr=ocr, do_table_structure=tables
+    )
     chunks = processor.process_pdf(pdf_path)
 
     click.echo(f"\n✓ Extracted {len(chunks)} chunks\n")
@@ -110,52 +184,122 @@ def process_pdf(pdf_path, chunk_size, chunk_overlap):
 @click.argument("pdf_path", type=click.Path(exists=True))
 @click.option("--chunk-size", default=512, help="Chunk size in characters")
 @click.option("--chunk-overlap", default=50, help="Overlap between chunks")
-def ingest(pdf_path, chunk_size, chunk_overlap):
+@click.option("--ocr/--no-ocr", default=False, help="Run OCR on scanned pages")
+@click.option("--tables/--no-tables", default=False, help="Recover table structure")
+@click.option("--via-daemon", is_flag=True, help="Run in the `serve` daemon (models already loaded)")
+def ingest(pdf_path, chunk_size, chunk_overlap, ocr, tables, via_daemon):
     """Process PDF and insert into vector database"""
-    click.echo(f"Ingesting PDF: {pdf_path}")
+    if via_daemon:
+        _send_to_daemon(
+            ["ingest", str(Path(pdf_path).resolve()), *_pdf_options(chunk_size, chunk_overlap, ocr, tables)]
+        )
+        return
 
-    # Initialize components
-    init_components()
+    click.echo(f"Ingesting PDF: {pdf_path}")
 
     # Process PDF
     click.echo("1. Extracting and chunking PDF...")
-    processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    processor = DocumentProcessor(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, do_ocr=ocr, do_table_structure=tables
+    )
     chunks = processor.process_pdf(pdf_path)
     click.echo(f"   ✓ Extracted {len(chunks)} chunks")
 
     # Generate embeddings
     click.echo("2. Generating embeddings...")
     texts = [chunk["content"] for chunk in chunks]
-    embeddings = config.embedding_model.embed_documents(texts, show_progress=True)
-
-    # Combine
-    for chunk, embedding in zip(chunks, embeddings, strict=False):
-        chunk["embedding"] = embedding
+    embeddings = _embed_unique(texts)
 
     # Insert into database
     click.echo("3. Inserting into vector database...")
-    count = config.vector_store.insert_chunks(chunks)
+    count = get_vector_store().insert_chunks_bulk(
+        texts=texts, metadatas=[chunk["metadata"] for chunk in chunks], embeddings=embeddings
+    )
+    get_retrieval_cache().invalidate()
     click.echo(f"   ✓ Inserted {count} chunks into database")
 
     click.echo(f"\n✓ Ingestion complete for {Path(pdf_path).name}")
 
 
+def _pdf_options(chunk_size: int, chunk_overlap: int, ocr: bool, tables: bool) -> list[str]:
+    """Rebuild the PDF processing options as CLI arguments (for the daemon)"""
+    return [
+        "--chunk-size",
+        str(chunk_size),
+        "--chunk-overlap",
+        str(chunk_overlap),
+        "--ocr" if ocr else "--no-ocr",
+        "--tables" if tables else "--no-tables",
+    ]
+
+
+def _process_one(pdf_path: str, chunk_size: int, chunk_overlap: int, ocr: bool, tables: bool) -> list[dict]:
+    """Extract and chunk a single PDF (module-level so it can run in a worker process)"""
+    processor = DocumentProcessor(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, do_ocr=ocr, do_table_structure=tables
+    )
+    return processor.process_pdf(pdf_path)
+
+
+@cli.command()
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.option("--chunk-size", default=512, help="Chunk size in characters")
+@click.option("--chunk-overlap", default=50, help="Overlap between chunks")
+@click.option("--ocr/--no-ocr", default=False, help="Run OCR on scanned pages")
+@click.option("--tables/--no-tables", default=False, help="Recover table structure")
+@click.option("--workers", default=os.cpu_count(), help="Number of parallel PDF processes")
+def ingest_dir(directory, chunk_size, chunk_overlap, ocr, tables, workers):
+    """Process all PDFs in a directory in parallel and insert into vector database"""
+    pdfs = sorted(str(p) for p in Path(directory).glob("*.pdf"))
+    if not pdfs:
+        click.echo(f"No PDF files found in {directory}")
+        return
+
+    click.echo(f"Ingesting {len(pdfs)} PDFs from {directory}")
+
+    # Process PDFs in parallel (one process per file)
+    click.echo(f"1. Extracting and chunking PDFs ({workers} workers)...")
+    all_chunks = []
+    # Spawned workers: this may be the multi-threaded `serve` daemon, and forking it would copy locks held by
+    # other threads (Langfuse, connection pools) into the children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_process_one, pdf, chunk_size, chunk_overlap, ocr, tables): pdf for pdf in pdfs}
+        for future in as_completed(futures):
+            chunks = future.result()
+            click.echo(f"   ✓ {Path(futures[future]).name}: {len(chunks)} chunks")
+            all_chunks.extend(chunks)
+    click.echo(f"   ✓ Extracted {len(all_chunks)} chunks in total")
+
+    # Generate embeddings in a single batch
+    click.echo("2. Generating embeddings...")
+    texts = [chunk["content"] for chunk in all_chunks]
+    embeddings = _embed_unique(texts)
+
+    # Insert into database
+    click.echo("3. Inserting into vector database...")
+    count = get_vector_store().insert_chunks_bulk(
+        texts=texts, metadatas=[chunk["metadata"] for chunk in all_chunks], embeddings=embeddings
+    )
+    get_retrieval_cache().invalidate()
+    click.echo(f"   ✓ Inserted {count} chunks into database")
+
+    click.echo(f"\n✓ Ingestion complete for {len(pdfs)} PDFs")
+
+
 @cli.command()
 @click.option("--filename", help="Filter by document filename")
 def list_docs(filename):
     """List documents in the vector store"""
-    init_components()
-
     if filename:
-        count = config.vector_store.count_chunks(filename)
+        count = get_vector_store().count_chunks(filename)
         click.echo(f"Document: {filename}")
         click.echo(f"Chunks: {count}")
     else:
-        docs = config.vector_store.get_all_documents()
+        docs = get_vector_store().get_all_documents()
         click.echo(f"Total documents: {len(docs)}\n")
 
         for doc in docs:
-            count = config.vector_store.count_chunks(doc)
+            count = get_vector_store().count_chunks(doc)
             click.echo(f"- {doc}: {count} chunks")
 
 
@@ -163,10 +307,9 @@ def list_docs(filename):
 @click.argument("filename")
 def delete_doc(filename):
     """Delete a document from the vector store"""
-    init_components()
-
     if click.confirm(f'Delete all chunks from "{filename}"?'):
-        count = config.vector_store.delete_document(filename)
+        count = get_vector_store().delete_document(filename)
+        get_retrieval_cache().invalidate()
         click.echo(f"✓ Deleted {count} chunks from {filename}")
 
 
@@ -179,13 +322,12 @@ def delete_doc(filename):
 @click.option("--eco-mode/--no-eco-mode", default=False, help="Concise answers")
 @click.option("--document", help="Filter by document filename")
 @click.option("--show-sources/--no-show-sources", default=True, help="Show sources")
-def query(question, conversation_id, k, mmr, rerank, eco_mode, document, show_sources):
+@click.option("--stream/--no-stream", default=False, help="Print the answer as it is generated")
+def query(question, conversation_id, k, mmr, rerank, eco_mode, document, show_sources, stream):
     """Ask a question using RAG"""
-    init_components(use_reranker=rerank)
-
     click.echo(f"Question: {question}\n")
 
-    result = config.rag_system.query(
+    result = get_rag_system(use_reranker=rerank).query(
         question=question,
         conversation_id=conversation_id,
         k=k,
@@ -193,9 +335,16 @@ def query(question, conversation_id, k, mmr, rerank, eco_mode, document, show_so
         use_rerank=rerank,
         eco_mode=eco_mode,
         filter_document=document,
+        stream=stream,
     )
 
-    click.echo(f"Answer: {result['answer']}\n")
+    if stream:
+        click.echo("Answer: ", nl=False)
+        for delta in result["answer_stream"]:
+            click.echo(delta, nl=False)
+        click.echo("\n")
+    else:
+        click.echo(f"Answer: {result['answer']}\n")
 
     if show_sources and result["sources"]:
         click.echo(f"Sources ({len(result['sources'])}):")
@@ -228,7 +377,7 @@ def show_history(conversation_id):
         for msg in history:
             role = msg["role"].upper()
             content = msg["content"]
-            timestamp = msg["timestamp"]
+            timestamp = format_timestamp(msg["timestamp"])
             click.echo(f"[{timestamp}] {role}:")
             click.echo(f"{content}\n")
     except Exception as e:
@@ -246,11 +395,10 @@ def list_conversations():
             click.echo("No active conversations")
         else:
             click.echo(f"Active conversations: {len(convs)}\n")
-            for conv_id in convs:
-                history = conv_mgr.get_history(conv_id, limit=1)
-                last_msg = history[-1] if history else None
+            last_msgs = conv_mgr.get_last_messages(convs)
+            for conv_id, last_msg in zip(convs, last_msgs, strict=True):
                 if last_msg:
-                    click.echo(f"- {conv_id} (last message: {last_msg['timestamp']})")
+                    click.echo(f"- {conv_id} (last message: {format_timestamp(last_msg['timestamp'])})")
                 else:
                     click.echo(f"- {conv_id}")
     except Exception as e:
@@ -261,18 +409,19 @@ def list_conversations():
 @click.argument("question")
 @click.option("--k", default=5, help="Number of chunks to retrieve")
 @click.option("--document", help="Filter by document")
-def search(question, k, document):
+@click.option("--quantized", is_flag=True, help="Two-stage search over binary-quantized embeddings")
+def search(question, k, document, quantized):
     """Search for similar chunks (without LLM)"""
-    init_components()
-
     click.echo(f"Searching for: {question}\n")
 
     # Embed question
-    query_embedding = config.embedding_model.embed_text(question)
+    query_embedding = get_embedder().embed_text(question)
 
     # Search
     filter_metadata = {"filename": document} if document else None
-    results = config.vector_store.similarity_search(query_embedding, k=k, filter_metadata=filter_metadata)
+    results = get_vector_store().similarity_search(
+        query_embedding, k=k, filter_metadata=filter_metadata, prefilter=True, quantized=quantized
+    )
 
     click.echo(f"Found {len(results)} results:\n")
 
@@ -285,5 +434,50 @@ def search(question, k, document):
         click.echo()
 
 
+def _handle_daemon_request(line: str, writer):
+    """Run one daemon request, sending everything the command prints to the client"""
+    with redirect_stdout(writer), redirect_stderr(writer):
+        try:
+            args = json.loads(line)["args"]
+            if not args or args[0] not in DAEMON_COMMANDS:
+                raise click.UsageError(f"Command not available via daemon: {args[0] if args else ''}")
+            cli.main(args=args, prog_name="demo-rag", standalone_mode=False)
+        except click.ClickException as e:
+            click.echo(f"Error: {e.format_message()}", err=True)
+        except Exception as e:
+            click.echo(f"Error: {e}", err=True)
+
+
+@cli.command()
+@click.option("--socket", "socket_path", default=DAEMON_SOCKET, help="Unix socket path")
+def serve(socket_path):
+    """Keep models loaded and run commands sent with --via-daemon"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+    click.echo(f"✓ Daemon listening on {socket_path} (Ctrl+C to stop)")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            try:
+                with (
+                    conn,
+                    conn.makefile("r", encoding="utf-8") as reader,
+                    conn.makefile("w", encoding="utf-8", buffering=1) as writer,
+                ):
+                    _handle_daemon_request(reader.readline(), writer)
+            except OSError as e:
+                click.echo(f"Warning: client disconnected: {e}", err=True)
+    except KeyboardInterrupt:
+        click.echo("\nStopping daemon")
+    finally:
+        server.close()
+        os.unlink(socket_path)
+
+
 if __name__ == "__main__":
     cli()
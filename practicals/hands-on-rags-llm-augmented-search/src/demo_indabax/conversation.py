@@ -3,13 +3,21 @@ Conversation History Manager using Redis
 Simplified version inspired by Itnovem's redis_client.py
 """
 
-import json
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from typing import Any
 
+import orjson
 import redis
 
 
+def format_timestamp(timestamp: int | str) -> str:
+    """Format a message timestamp (ns since epoch, or legacy ISO string) as ISO 8601 UTC"""
+    if isinstance(timestamp, str):
+        return timestamp
+    return datetime.fromtimestamp(timestamp / 1e9, tz=timezone.utc).isoformat()
+
+
 class ConversationManager:
     """Simple Redis-based conversation history"""
 
@@ -20,7 +28,7 @@ class ConversationManager:
         password: str | None = None,
         db: int = 0,
     ):
-        self.client = redis.Redis(host=host, port=port, password=password, db=db, decode_responses=True)
+        self.client = redis.Redis(host=host, port=port, password=password, db=db, decode_responses=False)
         self.ttl = 3600 * 24  # 24 hours
 
     def add_message(
@@ -44,15 +52,15 @@ class ConversationManager:
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": time.time_ns(),  # formatted lazily, see format_timestamp()
             "metadata": metadata or {},
         }
 
-        # Append to list
-        self.client.rpush(key, json.dumps(message))
-
-        # Set expiration
-        self.client.expire(key, self.ttl)
+        # Append to list and set expiration in a single round-trip
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, orjson.dumps(message))
+            pipe.expire(key, self.ttl)
+            pipe.execute()
 
     def get_history(self, conversation_id: str, limit: int = 10) -> list[dict[str, Any]]:
         """
@@ -70,7 +78,7 @@ class ConversationManager:
         # Get last N messages
         messages = self.client.lrange(key, -limit, -1)
 
-        return [json.loads(msg) for msg in messages]
+        return [orjson.loads(msg) for msg in messages]
 
     def format_for_llm(self, conversation_id: str, limit: int = 5, include_system: bool = True) -> list[dict[str, str]]:
         """
@@ -108,5 +116,23 @@ class ConversationManager:
 
     def list_conversations(self) -> list[str]:
         """List all active conversation IDs"""
-        keys = self.client.keys("conversation:*")
-        return [k.replace("conversation:", "") for k in keys]
+        # SCAN iterates in small cursors instead of blocking Redis like KEYS
+        keys = self.client.scan_iter(match="conversation:*", count=500)
+        return [k.decode().split(":", 1)[1] for k in keys]
+
+    def get_last_messages(self, conversation_ids: list[str]) -> list[dict[str, Any] | None]:
+        """
+        Retrieve the last message of several conversations in one round-trip
+
+        Args:
+            conversation_ids: Conversation IDs
+
+        Returns:
+            Last message per conversation (None if empty), in input order
+        """
+        with self.client.pipeline(transaction=False) as pipe:
+            for conversation_id in conversation_ids:
+                pipe.lindex(f"conversation:{conversation_id}", -1)
+            messages = pipe.execute()
+
+        return [orjson.loads(msg) if msg else None for msg in messages]
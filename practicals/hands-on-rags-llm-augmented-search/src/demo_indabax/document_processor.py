@@ -3,17 +3,63 @@ PDF Extraction and Chunking using Docling
 Simple and clean implementation for RAG demo
 """
 
+import re
+import threading
+from bisect import bisect_right
 from pathlib import Path
 from typing import Any
 
-from docling.document_converter import DocumentConverter
+from docling.datamodel.base_models import InputFormat
+from docling.datamodel.pipeline_options import PdfPipelineOptions
+from docling.document_converter import DocumentConverter, PdfFormatOption
+
+
+# Sentence end markers: ". ", ".\n", "! ", "? "
+SENTENCE_BOUNDARY_RE = re.compile(r"\.[ \n]|[!?] ")
+
+# Section types that start a new section / subsection
+HEADER_TYPES = frozenset({"section_header", "heading", "title", "h1"})
+SUBHEADER_TYPES = frozenset({"h2", "h3", "subtitle"})
+
+# Process-wide converters, keyed by (do_ocr, do_table_structure)
+_CONVERTERS: dict[tuple[bool, bool], DocumentConverter] = {}
+_CONVERTERS_LOCK = threading.Lock()
+
+
+def get_converter(do_ocr: bool = False, do_table_structure: bool = False) -> DocumentConverter:
+    """Return a shared DocumentConverter that only loads the models it needs"""
+    key = (do_ocr, do_table_structure)
+    with _CONVERTERS_LOCK:
+        if key not in _CONVERTERS:
+            opts = PdfPipelineOptions(
+                do_ocr=do_ocr,
+                do_table_structure=do_table_structure,
+                generate_picture_images=False,
+            )
+            _CONVERTERS[key] = DocumentConverter(
+                format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=opts)}
+            )
+        return _CONVERTERS[key]
 
 
 class DocumentProcessor:
     """Extract text from PDFs and chunk them intelligently"""
 
-    def __init__(self, chunk_size: int = 1024, chunk_overlap: int = 128):
-        self.converter = DocumentConverter()
+    def __init__(
+        self,
+        chunk_size: int = 1024,
+        chunk_overlap: int = 128,
+        do_ocr: bool = False,
+        do_table_structure: bool = False,
+    ):
+        """
+        Args:
+            chunk_size: Target chunk size in characters
+            chunk_overlap: Overlap between chunks (sliding window chunking)
+            do_ocr: Run OCR on scanned pages (loads the OCR models)
+            do_table_structure: Recover table structure (loads the table model)
+        """
+        self.converter = get_converter(do_ocr, do_table_structure)
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
 
@@ -76,11 +122,16 @@ class DocumentProcessor:
         Returns:
             List of chunks with metadata
         """
+        filename = doc_data["metadata"]["filename"]
+        title = doc_data["metadata"]["title"]
+
         chunks = []
-        current_chunk_text = ""
+        # Buffer of section texts, joined with "\n\n" only when a chunk is emitted
+        current_chunk_buf: list[str] = []
+        current_chunk_len = 0
         current_chunk_metadata = {
-            "filename": doc_data["metadata"]["filename"],
-            "title": doc_data["metadata"]["title"],
+            "filename": filename,
+            "title": title,
             "section": None,
             "subsection": None,
             "types": [],
@@ -88,24 +139,24 @@ class DocumentProcessor:
 
         for section in doc_data["sections"]:
             # Track section hierarchy
-            if section["type"] in ["section_header", "heading", "title", "h1"]:
+            if section["type"] in HEADER_TYPES:
                 current_chunk_metadata["section"] = section["text"]
                 current_chunk_metadata["subsection"] = None
-            elif section["type"] in ["h2", "h3", "subtitle"]:
+            elif section["type"] in SUBHEADER_TYPES:
                 current_chunk_metadata["subsection"] = section["text"]
 
             # Add this section to current chunk
-            if current_chunk_text:
-                current_chunk_text += "\n\n" + section["text"]
-            else:
-                current_chunk_text = section["text"]
+            if current_chunk_buf:
+                current_chunk_len += 2
+            current_chunk_buf.append(section["text"])
+            current_chunk_len += len(section["text"])
 
             current_chunk_metadata["types"].append(section["type"])
 
             # If chunk is big enough, create a chunk
-            if len(current_chunk_text) >= self.chunk_size:
+            if current_chunk_len >= self.chunk_size:
                 chunk = {
-                    "content": current_chunk_text.strip(),
+                    "content": "\n\n".join(current_chunk_buf).strip(),
                     "metadata": {
                         **current_chunk_metadata,
                         "chunk_index": len(chunks),
@@ -114,19 +165,21 @@ class DocumentProcessor:
                 chunks.append(chunk)
 
                 # Start new chunk
-                current_chunk_text = ""
+                current_chunk_buf = []
+                current_chunk_len = 0
                 current_chunk_metadata = {
-                    "filename": doc_data["metadata"]["filename"],
-                    "title": doc_data["metadata"]["title"],
+                    "filename": filename,
+                    "title": title,
                     "section": current_chunk_metadata["section"],
                     "subsection": current_chunk_metadata["subsection"],
                     "types": [],
                 }
 
         # Add remaining text as final chunk
-        if current_chunk_text.strip():
+        current_chunk_text = "\n\n".join(current_chunk_buf).strip()
+        if current_chunk_text:
             chunk = {
-                "content": current_chunk_text.strip(),
+                "content": current_chunk_text,
                 "metadata": {
                     **current_chunk_metadata,
                     "chunk_index": len(chunks),
@@ -141,20 +194,20 @@ class DocumentProcessor:
         if len(text) <= self.chunk_size:
             return [text]
 
+        # Precompute all sentence boundaries (end offset of each marker) in one pass
+        boundaries = [m.end() for m in SENTENCE_BOUNDARY_RE.finditer(text)]
+
         chunks = []
         start = 0
 
         while start < len(text):
             end = start + self.chunk_size
 
-            # Try to break at sentence boundary
+            # Try to break at the last sentence boundary inside the window
             if end < len(text):
-                # Look for sentence end markers
-                for marker in [". ", ".\n", "! ", "? "]:
-                    last_marker = text[start:end].rfind(marker)
-                    if last_marker != -1:
-                        end = start + last_marker + len(marker)
-                        break
+                i = bisect_right(boundaries, end) - 1
+                if i >= 0 and boundaries[i] > start:
+                    end = boundaries[i]
 
             chunks.append(text[start:end].strip())
             start = end - self.chunk_overlap
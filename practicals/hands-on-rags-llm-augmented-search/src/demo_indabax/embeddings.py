@@ -3,13 +3,30 @@ Embeddings Module - Small, efficient HuggingFace model for demo
 Using sentence-transformers/all-MiniLM-L6-v2 (384 dimensions, very fast)
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
+from sentence_transformers.util import batch_to_device
+from tqdm import tqdm
 
 
 class EmbeddingModel:
-    """Lightweight embedding model for RAG demo"""
+    """Lightweight embedding model for RAG demo
+
+    Embeddings are L2-normalized, so cosine similarity equals the inner product.
+    """
 
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        cache_size: int = 10000,
+        backend: str = "torch",
+    ):
         """
         Initialize embedding model
 
@@ -18,13 +35,70 @@ class EmbeddingModel:
                 - all-MiniLM-L6-v2: 384 dim, very fast (default)
                 - all-MiniLM-L12-v2: 384 dim, more accurate
                 - paraphrase-multilingual-MiniLM-L12-v2: 384 dim, multilingual
+            cache_size: Max number of query embeddings kept in the LRU cache (0 disables it)
+            backend: Inference backend
+                - torch: FP32 PyTorch (default)
+                - fp16: PyTorch in half precision (GPU only, falls back to FP32 on CPU)
+                - onnx-int8: ONNX Runtime with the model's INT8 (AVX512-VNNI) export,
+                  requires `sentence-transformers[onnx]`; falls back to FP32 if unavailable
         """
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        print(f"Loading embedding model: {model_name} (backend: {backend})")
+        self.model_name = model_name
+        self.backend = backend
+        self.model = self._load_model(model_name, backend)
         self.dimension = self.model.get_sentence_embedding_dimension()
         print(f"Model loaded! Embedding dimension: {self.dimension}")
 
-    def embed_text(self, text: str | list[str]) -> list[float] | list[list[float]]:
+        # LRU cache of single-text embeddings (repeated queries skip the forward pass)
+        self.cache_size = cache_size
+        self._cache: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _load_model(model_name: str, backend: str) -> SentenceTransformer:
+        """Load the SentenceTransformer for the requested backend, falling back to FP32 torch"""
+        if backend == "onnx-int8":
+            try:
+                return SentenceTransformer(
+                    model_name,
+                    backend="onnx",
+                    model_kwargs={"file_name": "onnx/model_qint8_avx512_vnni.onnx"},
+                )
+            except Exception as e:
+                print(f"Warning: ONNX INT8 backend unavailable ({e}), using FP32")
+                return SentenceTransformer(model_name)
+
+        model = SentenceTransformer(model_name)
+        if backend == "fp16":
+            if model.device.type == "cuda":
+                model.half()
+            else:
+                print("Warning: FP16 requires a GPU, using FP32")
+        elif backend != "torch":
+            raise ValueError(f"Unknown embedding backend: {backend}")
+        return model
+
+    def _cache_key(self, text: str) -> bytes:
+        """Cache key: SHA-256 of model name + text"""
+        return hashlib.sha256((self.model_name + "\0" + text).encode("utf-8")).digest()
+
+    def _cache_get(self, key: bytes) -> np.ndarray | None:
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+
+    def _cache_put(self, key: bytes, embedding: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def embed_text(self, text: str | list[str]) -> np.ndarray:
         """
         Generate embeddings for text(s)
 
@@ -32,26 +106,119 @@ class EmbeddingModel:
             text: Single text string or list of texts
 
         Returns:
-            Single embedding or list of embeddings
+            Single embedding of shape (dimension,) or array of shape (len(text), dimension).
+            Arrays are passed as-is to the vector store (pgvector numpy adapter).
         """
-        embeddings = self.model.encode(text, convert_to_numpy=True)
-
-        # Convert to list format for PostgreSQL
         if isinstance(text, str):
-            return embeddings.tolist()
+            key = self._cache_key(text)
+            embedding = self._cache_get(key)
+            if embedding is None:
+                embedding = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+                self._cache_put(key, embedding)
+            # Copy: callers may modify the returned array in place, the cached one must not change
+            return embedding.copy()
+
+        return self.embed_batch(text, show_progress=False)
+
+    def embed_batch(
+        self, texts: list[str], show_progress: bool = False, batch_size: int = 64, cache: bool = True
+    ) -> np.ndarray:
+        """
+        Embed a batch of texts, only encoding the ones missing from the cache
+
+        Args:
+            texts: List of texts
+            show_progress: Show progress bar
+            batch_size: Encoder batch size for cache misses
+            cache: Use the query cache; False encodes every text and leaves the cache untouched
+                (document chunks would only evict the query embeddings it is meant for)
+
+        Returns:
+            Array of shape (len(texts), dimension), in input order
+        """
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+        miss_keys: list[bytes] = []
+        miss_texts: list[str] = []
+        miss_idx: list[int] = []
+
+        # Partition into cached vs uncached texts
+        if not cache:
+            miss_texts, miss_idx = texts, list(range(len(texts)))
         else:
-            return [emb.tolist() for emb in embeddings]
+            for i, text in enumerate(texts):
+                key = self._cache_key(text)
+                embedding = self._cache_get(key)
+                if embedding is not None:
+                    out[i] = embedding
+                else:
+                    miss_keys.append(key)
+                    miss_texts.append(text)
+                    miss_idx.append(i)
+
+        # Encode all misses at once, stitched back in original order
+        if miss_texts:
+            if len(miss_texts) > batch_size:
+                new = self._encode_prefetch(miss_texts, batch_size=batch_size, show_progress=show_progress)
+            else:
+                new = self.model.encode(
+                    miss_texts,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    show_progress_bar=show_progress,
+                    batch_size=batch_size,
+                )
+            out[miss_idx] = new
+            if cache:
+                for key, embedding in zip(miss_keys, new, strict=True):
+                    self._cache_put(key, embedding.copy())
+
+        return out
+
+    def _encode_prefetch(self, texts: list[str], batch_size: int, show_progress: bool) -> np.ndarray:
+        """
+        Encode texts, tokenizing batch N+1 on a background thread while batch N runs through the model
+
+        Args:
+            texts: List of texts
+            batch_size: Number of texts per forward pass
+            show_progress: Show progress bar
+
+        Returns:
+            Normalized float32 array of shape (len(texts), dimension), in input order
+        """
+        out = np.empty((len(texts), self.dimension), dtype=np.float32)
+
+        # Group texts of similar length to minimize padding (like SentenceTransformer.encode)
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        batches = [order[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        def tokenize(idx: np.ndarray) -> dict:
+            return self.model.tokenize([texts[j] for j in idx])
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(tokenize, batches[0])
+            for i, idx in enumerate(tqdm(batches, desc="Batches", disable=not show_progress)):
+                features = future.result()
+                if i + 1 < len(batches):
+                    future = executor.submit(tokenize, batches[i + 1])
+
+                features = batch_to_device(features, self.model.device)
+                with torch.inference_mode():
+                    embeddings = self.model(features)["sentence_embedding"]
+                embeddings = torch.nn.functional.normalize(embeddings.float(), p=2, dim=1)
+                out[idx] = embeddings.cpu().numpy()
+
+        return out
 
-    def embed_documents(self, texts: list[str], show_progress: bool = True) -> list[list[float]]:
+    def embed_documents(self, texts: list[str], show_progress: bool = True) -> np.ndarray:
         """
-        Batch embed multiple documents efficiently
+        Batch embed multiple documents efficiently (bypassing the query cache)
 
         Args:
             texts: List of document texts
             show_progress: Show progress bar
 
         Returns:
-            List of embeddings
+            Float32 array of shape (len(texts), dimension), passed as-is to the vector store
         """
-        embeddings = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=show_progress, batch_size=32)
-        return [emb.tolist() for emb in embeddings]
+        return self.embed_batch(texts, show_progress=show_progress, cache=False)
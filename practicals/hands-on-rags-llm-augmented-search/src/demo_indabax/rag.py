@@ -4,6 +4,13 @@ Inspired by Itnovem's tool-based approach
 """
 
 import os
+import re
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Any
 
 from dotenv import load_dotenv
@@ -12,40 +19,184 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+import httpx
+import numpy as np
 from conversation import ConversationManager
 from embeddings import EmbeddingModel
 from openai import OpenAI
 from reranker import Reranker
+from retrieval_cache import RetrievalCache
+from tracing import AsyncLangfuseProcessor, NoopLangfuse
 from vector_store import VectorStore
 from web_search import WebSearchTool
 
 
-# Optional Langfuse integration
+# Optional Langfuse integration (read once at import)
+LANGFUSE_PUBLIC_KEY = os.getenv("LANGFUSE_PUBLIC_KEY")
+LANGFUSE_SECRET_KEY = os.getenv("LANGFUSE_SECRET_KEY")
+LANGFUSE_HOST = os.getenv("LANGFUSE_HOST") or os.getenv("LANGFUSE_BASE_URL", "https://cloud.langfuse.com")
+# Traces are flushed in the background and at exit; set to 1 to flush after every query (debugging)
+LANGFUSE_ENFORCE_FLUSH = os.getenv("RAG_LANGFUSE_ENFORCE_FLUSH") == "1"
+
+# When disabled, langfuse_client is a no-op stub so call sites need no guards
+langfuse_client: Any = NoopLangfuse()
+LANGFUSE_ENABLED = False
+
 try:
     from langfuse import Langfuse
 
     # Only initialize if keys are present
-    public_key = os.getenv("LANGFUSE_PUBLIC_KEY")
-    secret_key = os.getenv("LANGFUSE_SECRET_KEY")
-
-    if public_key and secret_key:
-        langfuse_client = Langfuse(
-            public_key=public_key,
-            secret_key=secret_key,
-            host=os.getenv("LANGFUSE_HOST") or os.getenv("LANGFUSE_BASE_URL", "https://cloud.langfuse.com"),
+    if LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY:
+        _langfuse = Langfuse(
+            public_key=LANGFUSE_PUBLIC_KEY,
+            secret_key=LANGFUSE_SECRET_KEY,
+            host=LANGFUSE_HOST,
         )
         LANGFUSE_ENABLED = True
         print(
-            f"✓ Langfuse enabled - traces will be sent to {langfuse_client._client_wrapper._base_url if hasattr(langfuse_client, '_client_wrapper') else 'Langfuse Cloud'}"
+            f"✓ Langfuse enabled - traces will be sent to {_langfuse._client_wrapper._base_url if hasattr(_langfuse, '_client_wrapper') else 'Langfuse Cloud'}"
         )
-    else:
-        langfuse_client = None
-        LANGFUSE_ENABLED = False
+        # Span calls are emitted from a background thread, never on the request path
+        langfuse_client = AsyncLangfuseProcessor(_langfuse)
 except Exception:
-    langfuse_client = None
+    langfuse_client = NoopLangfuse()
     LANGFUSE_ENABLED = False
 
 
+# Tool routing keywords: single words are matched as whole tokens (set lookup),
+# multi-word phrases with one precompiled regex per category
+# 1. Direct LLM for greetings (no context needed)
+GREETING_WORDS = frozenset({"hello", "hi", "hey", "thank", "thanks"})
+GREETING_PHRASES = ("good morning", "good evening")
+
+# 2. Web Search for real-time/current information
+WEB_SEARCH_WORDS = frozenset(
+    {
+        "weather",
+        "temperature",
+        "forecast",
+        "news",
+        "today",
+        "current",
+        "latest",
+        "recent",
+        "recently",
+        "price",
+        "prices",
+        "stock",
+        "stocks",
+        "market",
+        "markets",
+    }
+)
+WEB_SEARCH_PHRASES = ("who is the current", "who won", "when did", "what happened")
+
+# 3. RAG for document-specific questions
+RAG_WORDS = frozenset({"document", "documents", "pdf", "pdfs", "docling", "paper", "papers"})
+RAG_PHRASES = ("according to", "in the", "from the")
+
+WORD_RE = re.compile(r"[a-z']+")
+
+
+def _compile_phrases(phrases: tuple[str, ...]) -> re.Pattern[str]:
+    """Compile a phrase list into one whole-word alternation, scanned in a single pass"""
+    return re.compile(r"\b(?:" + "|".join(re.escape(phrase) for phrase in phrases) + r")\b", re.IGNORECASE)
+
+
+# (words, phrases, tool) in priority order
+ROUTING_RULES = (
+    (GREETING_WORDS, _compile_phrases(GREETING_PHRASES), "direct_llm"),
+    (WEB_SEARCH_WORDS, _compile_phrases(WEB_SEARCH_PHRASES), "web_search"),
+    (RAG_WORDS, _compile_phrases(RAG_PHRASES), "rag"),
+)
+
+
+# System prompts are constant so the provider can cache the prompt prefix;
+# per-request instructions (eco mode) and context go in the user turn
+SYSTEM_PROMPT_DIRECT = "You are a helpful AI assistant."
+SYSTEM_PROMPT_RAG = "You are a helpful AI assistant. Answer based on the provided context."
+SYSTEM_PROMPT_WEB = "You are a helpful AI assistant. Answer based on the web search results provided."
+SYSTEM_PROMPT_HYBRID = "You are a helpful AI assistant. Answer based on the provided documents and web results."
+ECO_INSTRUCTION = "Be concise and direct."
+
+# Hybrid (documents + web) answers: reciprocal rank fusion constant, and how long to wait
+# for web results, which are optional there
+RRF_K = 60
+HYBRID_WEB_TIMEOUT = 1.5
+
+
+def _with_eco(user_prompt: str, eco_mode: bool) -> str:
+    """Prefix the user prompt with the eco mode instruction if enabled"""
+    return f"{ECO_INSTRUCTION}\n\n{user_prompt}" if eco_mode else user_prompt
+
+
+def _chunk_previews(sources: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Tracing view of document sources (reuses their content preview)"""
+    return [
+        {
+            "filename": source["filename"],
+            "section": source["section"],
+            "content_preview": source["content"],
+            "score": source["score"],
+        }
+        for source in sources
+    ]
+
+
+def _web_previews(sources: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Tracing view of web search sources (reuses their snippet preview)"""
+    return [
+        {
+            "title": source["section"],
+            "snippet": source["content"],
+            "link": source["link"],
+        }
+        for source in sources
+    ]
+
+
+def _web_source(result: dict[str, Any], rank: int) -> dict[str, Any]:
+    """Source entry for a web search result (rank starts at 0)"""
+    return {
+        "filename": "Web Search",
+        "section": result["title"],
+        "content": result["snippet"][:200] + "...",
+        "score": 1.0 - (rank * 0.1),  # Decreasing score
+        "link": result["link"],
+    }
+
+
+def _release_resources(pool: ThreadPoolExecutor, web_search: WebSearchTool | None, llm: OpenAI):
+    """Stop a RAG system's background threads and close its LLM HTTP connections"""
+    pool.shutdown(wait=False, cancel_futures=True)
+    if web_search:
+        web_search.close()
+    llm.close()
+
+
+def _copy_result(result: dict[str, Any]) -> dict[str, Any]:
+    """Copy of a query result without its answer stream (sources are copied too: cached ones must not change)"""
+    copied = {key: value for key, value in result.items() if key != "answer_stream"}
+    copied["sources"] = [dict(source) for source in result["sources"]]
+    return copied
+
+
+def _reciprocal_rank_fusion(*rankings: list[Any], k: int) -> list[tuple[int, Any]]:
+    """
+    Merge ranked lists with reciprocal rank fusion (score = sum of 1 / (RRF_K + rank))
+
+    Returns:
+        Top k (ranking index, item) pairs, best first
+    """
+    scored = [
+        (1.0 / (RRF_K + rank), -index, item)
+        for index, ranking in enumerate(rankings)
+        for rank, item in enumerate(ranking, 1)
+    ]
+    scored.sort(key=lambda entry: entry[:2], reverse=True)
+    return [(-index, item) for _score, index, item in scored[:k]]
+
+
 class RAGSystem:
     """Main RAG orchestrator with tool routing capabilities"""
 
@@ -58,18 +209,67 @@ class RAGSystem:
         llm_api_key: str | None = None,
         llm_model: str = "gpt-3.5-turbo",
         enable_web_search: bool = True,
+        cache_size: int = 512,
+        semantic_threshold: float = 0.92,
+        web_search_timeout: float = 10.0,
+        retrieval_cache: RetrievalCache | None = None,
     ):
+        """
+        Args:
+            embedding_model: Model used to embed questions
+            vector_store: Document store to retrieve from
+            conversation_manager: Optional Redis conversation history
+            reranker: Optional cross-encoder reranker
+            llm_api_key: OpenAI API key (default: OPENAI_API_KEY)
+            llm_model: Chat completion model
+            enable_web_search: Enable the web search tool
+            cache_size: Max cached answers (0 disables the answer cache, which also needs retrieval_cache)
+            semantic_threshold: Cosine similarity above which a previous question's answer is reused
+            web_search_timeout: Seconds to wait for web results before answering without them
+            retrieval_cache: Optional Redis cache of query embeddings and retrieval results
+        """
         self.embedding_model = embedding_model
         self.vector_store = vector_store
         self.conversation_manager = conversation_manager
         self.reranker = reranker
-
-        # LLM client (OpenAI-compatible)
-        self.llm = OpenAI(api_key=llm_api_key or os.getenv("OPENAI_API_KEY"))
+        self.retrieval_cache = retrieval_cache
+
+        # LLM client (OpenAI-compatible), on one persistent HTTP/2 connection pool so concurrent
+        # and streamed completions reuse TLS connections instead of opening new ones
+        self.llm = OpenAI(
+            api_key=llm_api_key or os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            ),
+        )
         self.llm_model = llm_model
 
         # Web search tool (optional fallback)
         self.web_search = WebSearchTool() if enable_web_search else None
+        self.web_search_timeout = web_search_timeout
+
+        # Background pool for I/O that can overlap with retrieval (e.g. Redis history)
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag")
+
+        # Answer cache: exact match on the normalized question, then semantic match
+        # on the question embedding (ring buffer of cache_size rows)
+        self.cache_size = cache_size
+        self.semantic_threshold = semantic_threshold
+        self._cache_lock = threading.RLock()
+        self._exact_cache: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+        self._sem_matrix = np.zeros((cache_size, embedding_model.dimension), dtype=np.float32)
+        self._sem_keys: list[tuple | None] = [None] * cache_size
+        self._sem_next = 0
+
+        # Threads and HTTP connections are released once the instance is garbage-collected, so an instance
+        # replaced in a shared cache keeps serving the queries still holding it (close() releases them now)
+        self._release = weakref.finalize(self, _release_resources, self._pool, self.web_search, self.llm)
+
+    def close(self):
+        """Stop the background threads and close the LLM HTTP connections (shared components stay open)"""
+        self._release()
 
     def query(
         self,
@@ -80,6 +280,7 @@ class RAGSystem:
         use_rerank: bool = False,
         eco_mode: bool = False,
         filter_document: str | None = None,
+        stream: bool = False,
     ) -> dict[str, Any]:
         """
         Main query method with intelligent tool routing
@@ -92,43 +293,76 @@ class RAGSystem:
             use_rerank: Use reranker for better relevance
             eco_mode: Concise answers (fewer tokens)
             filter_document: Optional document filename filter
+            stream: Stream the LLM answer
 
         Returns:
-            Dict with answer, sources, and metadata
+            Dict with answer, sources, and metadata.
+            With stream=True, "answer_stream" yields the answer text as it is generated;
+            "answer" and "num_tokens" are filled in once it has been consumed.
         """
-        # Start Langfuse trace
-        main_trace = None
-        if LANGFUSE_ENABLED:
-            # Create a trace and get the span object
-            main_trace = langfuse_client.start_span(
-                name="rag_query",
-                input={
-                    "question": question,
-                    "k": k,
-                    "use_mmr": use_mmr,
-                    "use_rerank": use_rerank,
-                    "eco_mode": eco_mode,
-                },
-                metadata={"conversation_id": conversation_id, "filter_document": filter_document},
-            )
-
         # Decide which tool to use
         tool = self._route_to_tool(question)
 
+        # Answers depend on history, so only stateless queries are cached. They are keyed on the shared
+        # document generation, so documents ingested or deleted by any process invalidate them.
+        # Web results are time-sensitive: answers built on them are not cached (search results expire in minutes)
+        cache_key = None
+        question_embedding = None
+        if self.cache_size > 0 and not conversation_id and tool in ("direct_llm", "rag"):
+            generation = self._document_generation()
+            if generation is not None:
+                params = (k, use_mmr, use_rerank, eco_mode, filter_document, generation)
+                cache_key = (" ".join(question.lower().split()), params)
+        if cache_key is not None:
+            cached = self._cache_lookup(cache_key)
+            if cached is None and tool == "rag":
+                # Only document questions are embedded, once: retrieval reuses the embedding on a miss
+                question_embedding = self._embed_question(question)
+                cached = self._cache_lookup_similar(cache_key, question_embedding)
+            if cached is not None:
+                result = _copy_result(cached)
+                if stream:
+                    result["answer_stream"] = iter([result["answer"]])
+                return result
+
+        # Start Langfuse trace
+        # Create a trace and get the span object
+        main_trace = langfuse_client.start_span(
+            name="rag_query",
+            input={
+                "question": question,
+                "k": k,
+                "use_mmr": use_mmr,
+                "use_rerank": use_rerank,
+                "eco_mode": eco_mode,
+            },
+            metadata={"conversation_id": conversation_id, "filter_document": filter_document},
+        )
+
         # Log tool routing decision
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(
-                name="tool_routing",
-                input={"question": question},
-                output={"selected_tool": tool},
-                metadata={"routing_logic": "keyword_based"},
-            ).end()
+        langfuse_client.start_span(
+            name="tool_routing",
+            input={"question": question},
+            output={"selected_tool": tool},
+            metadata={"routing_logic": "keyword_based"},
+        ).end()
 
         # Route to appropriate tool
         if tool == "direct_llm":
-            result = self._answer_directly(question, conversation_id, eco_mode)
+            result = self._answer_directly(question, conversation_id, eco_mode, stream)
         elif tool == "web_search":
-            result = self._answer_with_web_search(question, conversation_id, eco_mode)
+            result = self._answer_with_web_search(question, conversation_id, eco_mode, stream)
+        elif tool == "hybrid":
+            result = self._answer_hybrid(
+                question,
+                conversation_id,
+                k,
+                use_mmr,
+                use_rerank,
+                eco_mode,
+                filter_document,
+                stream,
+            )
         elif tool == "rag":
             result = self._answer_with_rag(
                 question,
@@ -138,6 +372,8 @@ class RAGSystem:
                 use_rerank,
                 eco_mode,
                 filter_document,
+                stream,
+                question_embedding,
             )
         else:  # fallback to RAG
             result = self._answer_with_rag(
@@ -148,10 +384,30 @@ class RAGSystem:
                 use_rerank,
                 eco_mode,
                 filter_document,
+                stream,
+                question_embedding,
             )
 
-        # End trace with result
-        if main_trace:
+        # End trace and cache the result, after the answer has been streamed if streaming
+        if "answer_stream" in result:
+            result["answer_stream"] = self._finish_after_stream(result, main_trace, cache_key, question_embedding)
+        else:
+            self._finish(result, main_trace, cache_key, question_embedding)
+            if stream:
+                result["answer_stream"] = iter([result["answer"]])
+
+        return result
+
+    def _finish(
+        self,
+        result: dict[str, Any],
+        main_trace: Any,
+        cache_key: tuple | None,
+        question_embedding: np.ndarray | None,
+        completed: bool = True,
+    ):
+        """End the query trace and cache the answer"""
+        if LANGFUSE_ENABLED:
             trace_output = {
                 "answer": result["answer"],
                 "tool_used": result["tool_used"],
@@ -160,151 +416,243 @@ class RAGSystem:
             }
             main_trace.update(output=trace_output)
             main_trace.end()
-            langfuse_client.flush()
+            if LANGFUSE_ENFORCE_FLUSH:
+                langfuse_client.flush(wait=True)
+
+        if completed and cache_key is not None and result["tool_used"] not in ("web_search", "hybrid"):
+            self._cache_store(cache_key, question_embedding, _copy_result(result))
+
+    def _finish_after_stream(
+        self,
+        result: dict[str, Any],
+        main_trace: Any,
+        cache_key: tuple | None,
+        question_embedding: np.ndarray | None,
+    ) -> Iterator[str]:
+        """Yield the answer stream, then end the trace (and cache the answer if fully consumed)"""
+        completed = False
+        try:
+            yield from result["answer_stream"]
+            completed = True
+        finally:
+            self._finish(result, main_trace, cache_key, question_embedding, completed)
+
+    def _generate(
+        self,
+        messages: list[dict[str, str]],
+        temperature: float,
+        result: dict[str, Any],
+        on_complete: Callable[[str], None],
+        stream: bool,
+    ) -> dict[str, Any]:
+        """
+        Generate the answer with a streamed chat completion
 
+        Args:
+            messages: Chat messages
+            temperature: Sampling temperature
+            result: Result dict, "answer" and "num_tokens" are filled in when generation completes
+            on_complete: Called with the full answer (e.g. to save history)
+            stream: Return immediately with result["answer_stream"] yielding text deltas,
+                instead of consuming the stream here
+
+        Returns:
+            The result dict
+        """
+
+        def generate() -> Iterator[str]:
+            response = self.llm.chat.completions.create(
+                model=self.llm_model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+
+            parts = []
+            usage = None
+            for chunk in response:
+                if chunk.usage:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+
+            answer = "".join(parts)
+            result["answer"] = answer
+            result["num_tokens"] = usage.total_tokens if usage else 0
+
+            # Update LLM span with result
+            if LANGFUSE_ENABLED:
+                output = {"answer": answer}
+                if usage:
+                    output["input_tokens"] = usage.prompt_tokens
+                    output["output_tokens"] = usage.completion_tokens
+                    output["total_tokens"] = usage.total_tokens
+                langfuse_client.update_current_span(output=output)
+
+            on_complete(answer)
+
+        result["answer"] = ""
+        result["num_tokens"] = 0
+        if stream:
+            result["answer_stream"] = generate()
+        else:
+            for _ in generate():
+                pass
         return result
 
+    def _fetch_history(self, conversation_id: str | None, limit: int) -> Future | None:
+        """Start loading conversation history in the background (None if no history)"""
+        if not (conversation_id and self.conversation_manager):
+            return None
+        return self._pool.submit(self.conversation_manager.format_for_llm, conversation_id, limit, False)
+
+    def _document_generation(self) -> int | None:
+        """Shared document generation from the retrieval cache (None when unknown: answers are not cached)"""
+        if self.retrieval_cache is None:
+            return None
+        return self.retrieval_cache.generation()
+
+    def _cache_lookup(self, key: tuple) -> dict[str, Any] | None:
+        """Return the cached answer for an identical (normalized) question"""
+        with self._cache_lock:
+            result = self._exact_cache.get(key)
+            if result is not None:
+                self._exact_cache.move_to_end(key)
+            return result
+
+    def _cache_lookup_similar(self, key: tuple, embedding: np.ndarray) -> dict[str, Any] | None:
+        """Return the cached answer for a semantically similar question"""
+        with self._cache_lock:
+            # Embeddings are normalized: one matrix-vector product gives all cosine similarities
+            similarities = self._sem_matrix @ embedding
+            candidates = np.flatnonzero(similarities >= self.semantic_threshold)
+            for i in candidates[np.argsort(-similarities[candidates])]:
+                sem_key = self._sem_keys[i]
+                # Same retrieval parameters, and answer not evicted yet
+                if sem_key is not None and sem_key[1] == key[1] and sem_key in self._exact_cache:
+                    self._exact_cache.move_to_end(sem_key)
+                    return self._exact_cache[sem_key]
+            return None
+
+    def _cache_store(self, key: tuple, embedding: np.ndarray | None, result: dict[str, Any]):
+        """Cache an answer under its normalized question, and its embedding if the question was embedded"""
+        with self._cache_lock:
+            self._exact_cache[key] = result
+            self._exact_cache.move_to_end(key)
+            while len(self._exact_cache) > self.cache_size:
+                self._exact_cache.popitem(last=False)
+
+            if embedding is None:
+                return
+            self._sem_matrix[self._sem_next] = embedding
+            self._sem_keys[self._sem_next] = key
+            self._sem_next = (self._sem_next + 1) % self.cache_size
+
     def _route_to_tool(self, question: str) -> str:
         """
         Intelligent tool routing logic
 
         Returns:
-            'direct_llm', 'web_search', or 'rag'
+            'direct_llm', 'web_search', 'rag', or 'hybrid' (both documents and web, when
+            the question matches web keywords and names the documents explicitly)
         """
-        question_lower = question.lower()
-
-        # 1. Direct LLM for greetings (no context needed)
-        greeting_keywords = ["hello", "hi", "hey", "thank", "thanks", "good morning", "good evening"]
-        if any(kw in question_lower for kw in greeting_keywords):
+        # Trivial inputs ("ok", "?") never need retrieval
+        if len(question.strip()) <= 3:
             return "direct_llm"
 
-        # 2. Web Search for real-time/current information
-        web_search_keywords = [
-            "weather",
-            "temperature",
-            "forecast",
-            "news",
-            "today",
-            "current",
-            "latest",
-            "recent",
-            "price",
-            "stock",
-            "market",
-            "who is the current",
-            "who won",
-            "when did",
-            "what happened",
+        # Tokenize once, then a set lookup (and a phrase scan) per category; the first match
+        # in priority order wins, defaulting to RAG (try documents first)
+        tokens = set(WORD_RE.findall(question.lower()))
+        matched = [
+            tool for words, phrases, tool in ROUTING_RULES if not words.isdisjoint(tokens) or phrases.search(question)
         ]
-        if any(kw in question_lower for kw in web_search_keywords):
-            return "web_search"
-
-        # 3. RAG for document-specific questions
-        rag_keywords = ["document", "pdf", "according to", "in the", "from the", "docling", "paper"]
-        if any(kw in question_lower for kw in rag_keywords):
-            return "rag"
-
-        # 4. Default to RAG (try documents first)
-        return "rag"
-
-    def _answer_directly(self, question: str, conversation_id: str | None, eco_mode: bool) -> dict[str, Any]:
+        tool = matched[0] if matched else "rag"
+        if tool == "web_search" and not RAG_WORDS.isdisjoint(tokens) and self.web_search:
+            # Explicitly about the documents too: search documents and the web concurrently.
+            # Generic RAG phrases ("in the", "from the") don't count, they are common in web questions
+            tool = "hybrid"
+        return tool
+
+    def _answer_directly(
+        self, question: str, conversation_id: str | None, eco_mode: bool, stream: bool = False
+    ) -> dict[str, Any]:
         """Answer without RAG (direct LLM)"""
 
         # Start span for direct LLM
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(name="direct_llm", input={"question": question, "eco_mode": eco_mode})
-
-        messages = []
+        langfuse_client.start_span(name="direct_llm", input={"question": question, "eco_mode": eco_mode})
 
         # Add conversation history if available
+        messages = [{"role": "system", "content": SYSTEM_PROMPT_DIRECT}]
         if conversation_id and self.conversation_manager:
-            messages = self.conversation_manager.format_for_llm(conversation_id, limit=3)
-        else:
-            messages = [{"role": "system", "content": "You are a helpful AI assistant."}]
-
-        # Add eco mode instruction
-        if eco_mode:
-            messages[0]["content"] += " Be concise and direct in your answers."
+            messages += self.conversation_manager.format_for_llm(conversation_id, limit=3, include_system=False)
 
-        messages.append({"role": "user", "content": question})
+        # Eco mode instruction goes in the user turn to keep the prompt prefix cacheable
+        messages.append({"role": "user", "content": _with_eco(question, eco_mode)})
 
         # Call LLM
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(
-                name="llm_generation",
-                input={
-                    "model": self.llm_model,
-                    "messages": messages,
-                    "temperature": 0.7,
-                },
-                metadata={
-                    "system_prompt": messages[0]["content"] if messages else "",
-                    "user_question": question,
-                    "conversation_context": len(messages) > 1,
-                },
-            )
-
-        response = self.llm.chat.completions.create(model=self.llm_model, messages=messages, temperature=0.7)
-
-        answer = response.choices[0].message.content
+        langfuse_client.start_span(
+            name="llm_generation",
+            input={
+                "model": self.llm_model,
+                "messages": messages,
+                "temperature": 0.7,
+            },
+            metadata={
+                "system_prompt": SYSTEM_PROMPT_DIRECT,
+                "user_question": question,
+                "conversation_context": len(messages) > 1,
+            },
+        )
 
-        # Update span with result
-        if LANGFUSE_ENABLED:
-            langfuse_client.update_current_span(
-                output={
-                    "answer": answer,
-                    "input_tokens": response.usage.prompt_tokens,
-                    "output_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens,
-                }
-            )
+        # Save to conversation history once the answer is complete
+        def save_history(answer: str):
+            if conversation_id and self.conversation_manager:
+                self.conversation_manager.add_message(conversation_id, "user", question)
+                self.conversation_manager.add_message(conversation_id, "assistant", answer)
 
-        # Save to conversation history
-        if conversation_id and self.conversation_manager:
-            self.conversation_manager.add_message(conversation_id, "user", question)
-            self.conversation_manager.add_message(conversation_id, "assistant", answer)
-
-        return {
-            "answer": answer,
-            "sources": [],
-            "tool_used": "direct_llm",
-            "num_tokens": response.usage.total_tokens,
-        }
+        result = {"sources": [], "tool_used": "direct_llm"}
+        return self._generate(messages, 0.7, result, save_history, stream)
 
-    def _answer_with_rag(
+    def _retrieve(
         self,
         question: str,
-        conversation_id: str | None,
         k: int,
         use_mmr: bool,
         use_rerank: bool,
-        eco_mode: bool,
         filter_document: str | None,
-    ) -> dict[str, Any]:
-        """Answer using RAG pipeline"""
-
-        # Start span for RAG
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(
-                name="rag_pipeline",
-                input={"question": question, "k": k, "use_mmr": use_mmr, "use_rerank": use_rerank},
-            )
+        question_embedding: np.ndarray | None = None,
+    ) -> list[tuple[dict[str, Any], float]]:
+        """Embed the question (unless question_embedding is given) and retrieve (optionally rerank) matching chunks"""
+        reranked = use_rerank and self.reranker is not None
+        cache_params = (
+            self.embedding_model.model_name,
+            " ".join(question.lower().split()),
+            k,
+            use_mmr,
+            reranked,
+            filter_document,
+        )
+        # Generation read before searching: results are only cached if no document changed meanwhile
+        generation = None
+        if self.retrieval_cache:
+            generation, cached = self.retrieval_cache.get_results(*cache_params)
+            if cached is not None:
+                return cached
 
         # 1. Embed question
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(name="embedding", input={"text": question})
-        query_embedding = self.embedding_model.embed_text(question)
-        if LANGFUSE_ENABLED:
-            langfuse_client.update_current_span(output={"embedding_dim": len(query_embedding)})
+        langfuse_client.start_span(name="embedding", input={"text": question})
+        query_embedding = self._embed_question(question) if question_embedding is None else question_embedding
+        langfuse_client.update_current_span(output={"embedding_dim": len(query_embedding)})
 
         # 2. Retrieve documents
         filter_metadata = {"filename": filter_document} if filter_document else None
 
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(
-                name="vector_retrieval",
-                input={"method": "mmr" if use_mmr else "similarity", "k": k, "filter": filter_metadata},
-            )
+        langfuse_client.start_span(
+            name="vector_retrieval",
+            input={"method": "mmr" if use_mmr else "similarity", "k": k, "filter": filter_metadata},
+        )
 
         if use_mmr:
             # MMR for diversity
@@ -314,6 +662,7 @@ class RAGSystem:
                 lambda_mult=0.5,
                 fetch_k=k * 4,
                 filter_metadata=filter_metadata,
+                prefilter=True,
             )
         else:
             # Standard similarity search
@@ -321,18 +670,57 @@ class RAGSystem:
                 query_embedding,
                 k=k * 2 if use_rerank else k,  # Fetch more if reranking
                 filter_metadata=filter_metadata,
+                prefilter=True,
             )
 
-        if LANGFUSE_ENABLED:
-            langfuse_client.update_current_span(output={"num_results": len(results)})
+        langfuse_client.update_current_span(output={"num_results": len(results)})
 
         # 3. Optional reranking
         if use_rerank and self.reranker and results:
-            if LANGFUSE_ENABLED:
-                langfuse_client.start_span(name="reranking", input={"num_docs": len(results)})
+            langfuse_client.start_span(name="reranking", input={"num_docs": len(results)})
             results = self.reranker.rerank(question, results, top_k=k)
-            if LANGFUSE_ENABLED:
-                langfuse_client.update_current_span(output={"num_reranked": len(results)})
+            langfuse_client.update_current_span(output={"num_reranked": len(results)})
+
+        if self.retrieval_cache:
+            self.retrieval_cache.put_results(results, generation, *cache_params)
+        return results
+
+    def _embed_question(self, question: str) -> np.ndarray:
+        """Embed a question, going through the Redis embedding cache if configured"""
+        if not self.retrieval_cache:
+            return self.embedding_model.embed_text(question)
+
+        embedding = self.retrieval_cache.get_embedding(self.embedding_model.model_name, question)
+        if embedding is None:
+            embedding = self.embedding_model.embed_text(question)
+            self.retrieval_cache.put_embedding(self.embedding_model.model_name, question, embedding)
+        return embedding
+
+    def _answer_with_rag(
+        self,
+        question: str,
+        conversation_id: str | None,
+        k: int,
+        use_mmr: bool,
+        use_rerank: bool,
+        eco_mode: bool,
+        filter_document: str | None,
+        stream: bool = False,
+        question_embedding: np.ndarray | None = None,
+    ) -> dict[str, Any]:
+        """Answer using RAG pipeline (question_embedding: the question already embedded, if any)"""
+
+        # Start span for RAG
+        langfuse_client.start_span(
+            name="rag_pipeline",
+            input={"question": question, "k": k, "use_mmr": use_mmr, "use_rerank": use_rerank},
+        )
+
+        # Load history while embedding and retrieval run
+        history_future = self._fetch_history(conversation_id, limit=2)
+
+        # 1-3. Embed question, retrieve and optionally rerank
+        results = self._retrieve(question, k, use_mmr, use_rerank, filter_document, question_embedding)
 
         # If no relevant results from RAG, return empty
         if not results:
@@ -345,18 +733,13 @@ class RAGSystem:
                 "num_tokens": 0,
             }
 
-        # 4. Format context
-        context = self._format_context(results)
+        # 4. Format context, sources (their previews are reused for tracing) and scores in one pass
+        context, sources, scores = self._format_results(results)
 
         # 5. Build prompt with conversation history
-        messages = []
-        if conversation_id and self.conversation_manager:
-            messages = self.conversation_manager.format_for_llm(conversation_id, limit=2, include_system=False)
-
-        system_prompt = "You are a helpful AI assistant. Answer based on the provided context."
-        if eco_mode:
-            system_prompt += " Be concise and direct."
+        messages = history_future.result() if history_future else []
 
+        system_prompt = SYSTEM_PROMPT_RAG
         messages.insert(0, {"role": "system", "content": system_prompt})
 
         user_prompt = f"""Context from documents:
@@ -366,109 +749,75 @@ Question: {question}
 
 Answer based on the context above. If the context doesn't contain relevant information, say so."""
 
-        messages.append({"role": "user", "content": user_prompt})
+        messages.append({"role": "user", "content": _with_eco(user_prompt, eco_mode)})
 
         # 6. Generate answer
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(
-                name="llm_generation",
-                input={
-                    "model": self.llm_model,
-                    "messages": messages,
-                    "temperature": 0.3,
-                    "context_chunks": len(results),
-                    "context_length": len(context),
-                },
-                metadata={
-                    "system_prompt": system_prompt,
-                    "user_question": question,
-                    "full_context": context,
-                    "context_chunks": [
-                        {
-                            "filename": doc["metadata"].get("filename"),
-                            "section": doc["metadata"].get("section"),
-                            "content_preview": doc["content"][:200] + "...",
-                            "score": score,
-                        }
-                        for doc, score in results
-                    ],
-                },
-            )
-
-        response = self.llm.chat.completions.create(
-            model=self.llm_model,
-            messages=messages,
-            temperature=0.3,  # Lower temp for factual answers
+        langfuse_client.start_span(
+            name="llm_generation",
+            input={
+                "model": self.llm_model,
+                "messages": messages,
+                "temperature": 0.3,
+                "context_chunks": len(results),
+                "context_length": len(context),
+            },
+            # Built lazily on the tracing thread
+            metadata=lambda: {
+                "system_prompt": system_prompt,
+                "user_question": question,
+                "full_context": context,
+                "context_chunks": _chunk_previews(sources),
+            },
         )
 
-        answer = response.choices[0].message.content
-
-        # Update LLM span with result
-        if LANGFUSE_ENABLED:
-            langfuse_client.update_current_span(
-                output={
-                    "answer": answer,
-                    "input_tokens": response.usage.prompt_tokens,
-                    "output_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens,
-                }
-            )
-
-        # 7. Extract sources
-        sources = [
-            {
-                "content": doc["content"][:200] + "...",
-                "filename": doc["metadata"].get("filename"),
-                "section": doc["metadata"].get("section"),
-                "score": score,
-            }
-            for doc, score in results
-        ]
-
-        # Score each source in Langfuse
-        if LANGFUSE_ENABLED:
-            for i, (_doc, score) in enumerate(results):
-                langfuse_client.score_current_trace(name=f"source_{i + 1}_relevance", value=float(score))
-
-        # 8. Save to conversation history
-        if conversation_id and self.conversation_manager:
-            self.conversation_manager.add_message(
-                conversation_id,
-                "user",
-                question,
-                metadata={"sources_used": len(sources)},
-            )
-            self.conversation_manager.add_message(conversation_id, "assistant", answer, metadata={"sources": sources})
-
-        return {
-            "answer": answer,
+        # 7. Score each source in Langfuse
+        langfuse_client.emit_scores(scores)
+
+        # 8. Save to conversation history once the answer is complete
+        def save_history(answer: str):
+            if conversation_id and self.conversation_manager:
+                self.conversation_manager.add_message(
+                    conversation_id,
+                    "user",
+                    question,
+                    metadata={"sources_used": len(sources)},
+                )
+                self.conversation_manager.add_message(
+                    conversation_id, "assistant", answer, metadata={"sources": sources}
+                )
+
+        result = {
             "sources": sources,
             "tool_used": "rag",
             "retrieval_method": "mmr" if use_mmr else "similarity",
             "reranked": use_rerank and self.reranker is not None,
-            "num_tokens": response.usage.total_tokens,
         }
+        return self._generate(messages, 0.3, result, save_history, stream)  # Lower temp for factual answers
 
     def _answer_with_web_search(
         self,
         question: str,
         conversation_id: str | None,
         eco_mode: bool,
+        stream: bool = False,
     ) -> dict[str, Any]:
         """Answer using web search for real-time/current information"""
 
         # Start span for web search
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(name="web_search_pipeline", input={"question": question, "eco_mode": eco_mode})
+        langfuse_client.start_span(name="web_search_pipeline", input={"question": question, "eco_mode": eco_mode})
 
         print("🌐 Searching the web for current information...")
 
-        # 1. Search the web
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(name="web_search", input={"query": question})
-        search_results = self.web_search.search(question, max_results=3)
-        if LANGFUSE_ENABLED:
-            langfuse_client.update_current_span(output={"num_results": len(search_results)})
+        # 1. Search the web in the background, loading history meanwhile
+        langfuse_client.start_span(name="web_search", input={"query": question})
+        search_future = self._pool.submit(self.web_search.search, question, max_results=3)
+        history_future = self._fetch_history(conversation_id, limit=2)
+        try:
+            search_results = search_future.result(timeout=self.web_search_timeout)
+        except FutureTimeoutError:
+            print(f"Web search timed out after {self.web_search_timeout}s")
+            search_results = []
+        langfuse_client.update_current_span(output={"num_results": len(search_results)})
 
         if not search_results:
             return {
@@ -482,14 +831,9 @@ Answer based on the context above. If the context doesn't contain relevant infor
         context = self.web_search.format_results_for_context(search_results)
 
         # 3. Build prompt
-        messages = []
-        if conversation_id and self.conversation_manager:
-            messages = self.conversation_manager.format_for_llm(conversation_id, limit=2, include_system=False)
-
-        system_prompt = "You are a helpful AI assistant. Answer based on the web search results provided."
-        if eco_mode:
-            system_prompt += " Be concise and direct."
+        messages = history_future.result() if history_future else []
 
+        system_prompt = SYSTEM_PROMPT_WEB
         messages.insert(0, {"role": "system", "content": system_prompt})
 
         user_prompt = f"""{context}
@@ -498,97 +842,196 @@ Question: {question}
 
 Answer based on the web search results above."""
 
-        messages.append({"role": "user", "content": user_prompt})
+        messages.append({"role": "user", "content": _with_eco(user_prompt, eco_mode)})
+
+        # 4. Format sources for display (their snippet previews are reused for tracing)
+        sources = [_web_source(result, i) for i, result in enumerate(search_results)]
+
+        # 5. Generate answer
+        langfuse_client.start_span(
+            name="llm_generation",
+            input={
+                "model": self.llm_model,
+                "messages": messages,
+                "temperature": 0.7,
+                "web_results": len(search_results),
+                "context_length": len(context),
+            },
+            # Built lazily on the tracing thread
+            metadata=lambda: {
+                "system_prompt": system_prompt,
+                "user_question": question,
+                "web_search_results": _web_previews(sources),
+                "full_context": context,
+            },
+        )
 
-        # 4. Generate answer
-        if LANGFUSE_ENABLED:
-            langfuse_client.start_span(
-                name="llm_generation",
-                input={
-                    "model": self.llm_model,
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "web_results": len(search_results),
-                    "context_length": len(context),
-                },
-                metadata={
-                    "system_prompt": system_prompt,
-                    "user_question": question,
-                    "web_search_results": [
-                        {
-                            "title": result["title"],
-                            "snippet": result["snippet"][:200] + "...",
-                            "link": result["link"],
-                        }
-                        for result in search_results
-                    ],
-                    "full_context": context,
-                },
-            )
+        # Save to conversation history once the answer is complete
+        def save_history(answer: str):
+            if conversation_id and self.conversation_manager:
+                self.conversation_manager.add_message(
+                    conversation_id,
+                    "user",
+                    question,
+                    metadata={"web_search": True},
+                )
+                self.conversation_manager.add_message(
+                    conversation_id,
+                    "assistant",
+                    answer,
+                    metadata={"sources": sources, "from_web": True},
+                )
+
+        result = {"sources": sources, "tool_used": "web_search"}
+        return self._generate(messages, 0.3, result, save_history, stream)  # Lower temp for factual answers
+
+    def _answer_hybrid(
+        self,
+        question: str,
+        conversation_id: str | None,
+        k: int,
+        use_mmr: bool,
+        use_rerank: bool,
+        eco_mode: bool,
+        filter_document: str | None,
+        stream: bool = False,
+    ) -> dict[str, Any]:
+        """Answer from documents and web search run concurrently, fused into one LLM call"""
 
-        response = self.llm.chat.completions.create(
-            model=self.llm_model,
-            messages=messages,
-            temperature=0.3,  # Lower temp for factual answers
+        # Start span for hybrid retrieval
+        langfuse_client.start_span(
+            name="hybrid_pipeline",
+            input={"question": question, "k": k, "use_mmr": use_mmr, "use_rerank": use_rerank},
         )
 
-        answer = response.choices[0].message.content
+        # 1. Search the web and load history in the background while documents are retrieved
+        search_future = self._pool.submit(self.web_search.search, question, max_results=3)
+        history_future = self._fetch_history(conversation_id, limit=2)
+        results = self._retrieve(question, k, use_mmr, use_rerank, filter_document)
+        try:
+            search_results = search_future.result(timeout=HYBRID_WEB_TIMEOUT)
+        except FutureTimeoutError:
+            print(f"Web search timed out after {HYBRID_WEB_TIMEOUT}s, answering from documents only")
+            search_results = []
+
+        # 2. Fuse both rankings, keeping the top k overall
+        fused = _reciprocal_rank_fusion(results, search_results, k=k)
+        doc_results = [item for index, item in fused if index == 0]
+        web_results = [item for index, item in fused if index == 1]
+
+        if not fused:
+            return {
+                "answer": "I couldn't find relevant information in the documents or on the web.",
+                "sources": [],
+                "tool_used": "hybrid",
+                "retrieval_method": "similarity",
+                "reranked": False,
+                "num_tokens": 0,
+            }
+
+        # 3. Build prompt with both contexts
+        doc_context, doc_sources, _scores = self._format_results(doc_results)
+        context_parts = []
+        if doc_results:
+            context_parts.append(f"Context from documents:\n{doc_context}")
+        if web_results:
+            context_parts.append(self.web_search.format_results_for_context(web_results))
+        context = "\n\n".join(context_parts)
 
-        # Update LLM span with result
-        if LANGFUSE_ENABLED:
-            langfuse_client.update_current_span(
-                output={
-                    "answer": answer,
-                    "input_tokens": response.usage.prompt_tokens,
-                    "output_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens,
-                }
-            )
+        messages = history_future.result() if history_future else []
 
-        # 5. Format sources for display
+        system_prompt = SYSTEM_PROMPT_HYBRID
+        messages.insert(0, {"role": "system", "content": system_prompt})
+
+        user_prompt = f"""{context}
+
+Question: {question}
+
+Answer based on the documents and web search results above."""
+
+        messages.append({"role": "user", "content": _with_eco(user_prompt, eco_mode)})
+
+        # 4. Sources in fused order (their previews are reused for tracing)
+        web_ranks = {id(result): rank for rank, result in enumerate(search_results)}
+        doc_sources_iter = iter(doc_sources)
         sources = [
-            {
-                "filename": "Web Search",
-                "section": result["title"],
-                "content": result["snippet"][:200] + "...",
-                "score": 1.0 - (i * 0.1),  # Decreasing score
-                "link": result["link"],
-            }
-            for i, result in enumerate(search_results)
+            next(doc_sources_iter) if index == 0 else _web_source(item, web_ranks[id(item)]) for index, item in fused
         ]
 
-        # Save to conversation history
-        if conversation_id and self.conversation_manager:
-            self.conversation_manager.add_message(
-                conversation_id,
-                "user",
-                question,
-                metadata={"web_search": True},
-            )
-            self.conversation_manager.add_message(
-                conversation_id,
-                "assistant",
-                answer,
-                metadata={"sources": sources, "from_web": True},
-            )
+        # 5. Generate answer
+        langfuse_client.start_span(
+            name="llm_generation",
+            input={
+                "model": self.llm_model,
+                "messages": messages,
+                "temperature": 0.3,
+                "context_chunks": len(doc_results),
+                "web_results": len(web_results),
+                "context_length": len(context),
+            },
+            # Built lazily on the tracing thread
+            metadata=lambda: {
+                "system_prompt": system_prompt,
+                "user_question": question,
+                "full_context": context,
+                "context_chunks": _chunk_previews([src for src in sources if "link" not in src]),
+                "web_search_results": _web_previews([src for src in sources if "link" in src]),
+            },
+        )
 
-        return {
-            "answer": answer,
+        # Save to conversation history once the answer is complete
+        def save_history(answer: str):
+            if conversation_id and self.conversation_manager:
+                self.conversation_manager.add_message(
+                    conversation_id,
+                    "user",
+                    question,
+                    metadata={"sources_used": len(sources), "web_search": bool(web_results)},
+                )
+                self.conversation_manager.add_message(
+                    conversation_id,
+                    "assistant",
+                    answer,
+                    metadata={"sources": sources, "from_web": bool(web_results)},
+                )
+
+        result = {
             "sources": sources,
-            "tool_used": "web_search",
-            "num_tokens": response.usage.total_tokens,
+            "tool_used": "hybrid",
+            "retrieval_method": "mmr" if use_mmr else "similarity",
+            "reranked": use_rerank and self.reranker is not None,
         }
+        return self._generate(messages, 0.3, result, save_history, stream)
+
+    def _format_results(
+        self, results: list[tuple[dict[str, Any], float]]
+    ) -> tuple[str, list[dict[str, Any]], list[tuple[str, float]]]:
+        """
+        Format retrieved chunks in a single pass
 
-    def _format_context(self, results: list[tuple[dict[str, Any], float]]) -> str:
-        """Format retrieved chunks as context"""
-        formatted = []
+        Returns:
+            (context for the prompt, source entries for display, per-source Langfuse scores)
+        """
+        parts = []
+        sources = []
+        scores = []
         for i, (doc, score) in enumerate(results, 1):
             metadata = doc["metadata"]
-            source_info = f"[Source {i}: {metadata.get('filename', 'Unknown')}"
-            if metadata.get("section"):
-                source_info += f" - {metadata['section']}"
-            source_info += f" (relevance: {score:.2f})]"
-
-            formatted.append(f"{source_info}\n{doc['content']}\n")
+            content = doc["content"]
+            filename = metadata.get("filename")
+            section = metadata.get("section")
+
+            section_info = f" - {section}" if section else ""
+            parts.append(f"[Source {i}: {filename or 'Unknown'}{section_info} (relevance: {score:.2f})]\n{content}")
+            sources.append(
+                {
+                    "content": content[:200] + "...",
+                    "filename": filename,
+                    "section": section,
+                    "score": score,
+                }
+            )
+            scores.append((f"source_{i}_relevance", float(score)))
 
-        return "\n".join(formatted)
+        # One join, with a blank line between sources
+        return "\n\n".join(parts), sources, scores
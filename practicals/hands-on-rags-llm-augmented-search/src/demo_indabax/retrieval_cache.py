@@ -0,0 +1,120 @@
+"""
+Retrieval cache using Redis
+Query embeddings and retrieved chunks, shared across processes (CLI runs, Streamlit sessions)
+"""
+
+import hashlib
+from typing import Any
+
+import numpy as np
+import orjson
+import redis
+
+
+# Bumped on every document write; cached retrieval results (and answers) from an older generation are ignored
+GENERATION_KEY = "retrieval:generation"
+
+# SETEX KEYS[2] only if the generation (KEYS[1]) still equals ARGV[1], atomically and in one round-trip
+SET_IF_GENERATION = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') ~= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SETEX', KEYS[2], ARGV[2], ARGV[3])
+return 1
+"""
+
+
+class RetrievalCache:
+    """Redis-backed cache for query embeddings and retrieval results (Redis errors count as misses)"""
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        password: str | None = None,
+        db: int = 0,
+        ttl: int = 3600,
+    ):
+        self.client = redis.Redis(host=host, port=port, password=password, db=db, decode_responses=False)
+        self.ttl = ttl  # 1 hour
+        self._set_if_generation = self.client.register_script(SET_IF_GENERATION)
+
+    @staticmethod
+    def _key(prefix: str, *parts: Any) -> str:
+        digest = hashlib.blake2b("\0".join(str(part) for part in parts).encode("utf-8"), digest_size=16).hexdigest()
+        return f"{prefix}:{digest}"
+
+    def get_embedding(self, model_name: str, text: str) -> np.ndarray | None:
+        """Cached embedding of text (None on miss)"""
+        try:
+            data = self.client.get(self._key("embedding", model_name, text))
+        except redis.RedisError:
+            return None
+        return None if data is None else np.frombuffer(data, dtype=np.float32)
+
+    def put_embedding(self, model_name: str, text: str, embedding: np.ndarray):
+        """Cache an embedding as raw float32 bytes"""
+        try:
+            self.client.setex(
+                self._key("embedding", model_name, text), self.ttl, np.asarray(embedding, dtype=np.float32).tobytes()
+            )
+        except redis.RedisError:
+            pass
+
+    def generation(self) -> int | None:
+        """Current document generation, shared by every process (None if Redis is unavailable)"""
+        try:
+            return int(self.client.get(GENERATION_KEY) or 0)
+        except redis.RedisError:
+            return None
+
+    def get_results(self, *params: Any) -> tuple[int | None, list[tuple[dict[str, Any], float]] | None]:
+        """
+        Cached retrieval results for the given search parameters
+
+        Returns:
+            (current document generation, to pass to put_results after a miss; None if Redis is unavailable),
+            and the list of (chunk, score) tuples, or None on miss or if documents changed since
+        """
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(GENERATION_KEY)
+                pipe.get(self._key("retrieval", *params))
+                generation, data = pipe.execute()
+        except redis.RedisError:
+            return None, None
+
+        generation = int(generation or 0)
+        if data is None:
+            return generation, None
+        entry = orjson.loads(data)
+        if entry["generation"] != generation:
+            return generation, None
+        return generation, [(chunk, score) for chunk, score in entry["results"]]
+
+    def put_results(self, results: list[tuple[dict[str, Any], float]], generation: int | None, *params: Any):
+        """
+        Cache retrieval results for the given search parameters
+
+        Args:
+            results: List of (chunk, score) tuples
+            generation: Document generation read before the search (from get_results); if documents
+                changed since, the results may be stale and are not cached
+            params: Search parameters
+        """
+        if generation is None:
+            return
+        try:
+            entry = {"generation": generation, "results": results}
+            self._set_if_generation(
+                keys=[GENERATION_KEY, self._key("retrieval", *params)], args=[generation, self.ttl, orjson.dumps(entry)]
+            )
+        except redis.RedisError:
+            pass
+
+    def invalidate(self):
+        """Invalidate all cached retrieval results (call after inserting or deleting documents)"""
+        try:
+            self.client.incr(GENERATION_KEY)
+        except redis.RedisError:
+            pass
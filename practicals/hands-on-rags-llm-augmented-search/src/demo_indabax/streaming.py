@@ -0,0 +1,22 @@
+"""
+Helpers for streamed answers
+Kept free of UI imports so they can be used (and tested) without a Streamlit session
+"""
+
+import time
+from collections.abc import Iterator
+
+
+def coalesce_chunks(chunks: Iterator[str], interval: float = 0.075) -> Iterator[str]:
+    """Group streamed tokens into ~interval-second batches to limit Streamlit re-renders"""
+    buffer = []
+    last_flush = time.monotonic()
+    for chunk in chunks:
+        buffer.append(chunk)
+        now = time.monotonic()
+        if now - last_flush >= interval:
+            yield "".join(buffer)
+            buffer.clear()
+            last_flush = now
+    if buffer:
+        yield "".join(buffer)
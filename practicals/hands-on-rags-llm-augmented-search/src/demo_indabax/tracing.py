@@ -0,0 +1,184 @@
+"""
+Non-blocking Langfuse tracing
+Span calls are queued and replayed on a background thread, off the request path
+"""
+
+import atexit
+import itertools
+import queue
+import threading
+import weakref
+from typing import Any
+
+
+class SpanHandle:
+    """Placeholder for a span created asynchronously (supports update/end)
+
+    The background thread only keeps the real span while this handle is alive: once the caller
+    drops it (most spans are started and never touched again), the span is released.
+    """
+
+    def __init__(self, processor: "AsyncLangfuseProcessor", span_id: int):
+        self._processor = processor
+        self._span_id = span_id
+        release = weakref.finalize(self, processor._enqueue, ("release", span_id, None))
+        release.atexit = False
+
+    def update(self, **kwargs: Any) -> "SpanHandle":
+        self._processor._enqueue(("update", self._span_id, kwargs))
+        return self
+
+    def end(self) -> "SpanHandle":
+        self._processor._enqueue(("end", self._span_id, None))
+        return self
+
+
+class NoopLangfuse:
+    """Stand-in for the Langfuse client when tracing is disabled (every call does nothing)"""
+
+    def start_span(self, **kwargs: Any) -> "NoopLangfuse":
+        return self
+
+    def update(self, **kwargs: Any) -> "NoopLangfuse":
+        return self
+
+    def end(self) -> "NoopLangfuse":
+        return self
+
+    def update_current_span(self, **kwargs: Any):
+        pass
+
+    def score_current_trace(self, **kwargs: Any):
+        pass
+
+    def emit_scores(self, scores: list[tuple[str, float]]):
+        pass
+
+    def flush(self, wait: bool = False, timeout: float = 30.0):
+        pass
+
+
+class AsyncLangfuseProcessor:
+    """Drop-in wrapper around a Langfuse client that never blocks the caller
+
+    Calls are put on a bounded queue (dropped and counted when full) and executed in
+    order by a daemon thread, which also flushes the client when idle and at exit.
+    Keyword arguments may be zero-argument callables: they are only evaluated on the
+    background thread, so large payloads are never built on the request path.
+    """
+
+    _STOP = object()
+
+    def __init__(self, client: Any, max_queue_size: int = 10_000, flush_interval: float = 5.0):
+        """
+        Args:
+            client: Langfuse client
+            max_queue_size: Max pending calls before new ones are dropped
+            flush_interval: Seconds of inactivity after which pending events are flushed
+        """
+        self.client = client
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.errors = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._span_ids = itertools.count()
+        self._thread = threading.Thread(target=self._run, name="langfuse-emitter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def _enqueue(self, op: Any):
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self.dropped += 1
+
+    def start_span(self, **kwargs: Any) -> SpanHandle:
+        """Queue a span start; the returned handle can be updated and ended"""
+        span_id = next(self._span_ids)
+        self._enqueue(("start_span", span_id, kwargs))
+        return SpanHandle(self, span_id)
+
+    def update_current_span(self, **kwargs: Any):
+        self._enqueue(("update_current_span", None, kwargs))
+
+    def score_current_trace(self, **kwargs: Any):
+        self._enqueue(("score_current_trace", None, kwargs))
+
+    def emit_scores(self, scores: list[tuple[str, float]]):
+        """Queue several trace scores as a single entry"""
+        self._enqueue(("scores", None, scores))
+
+    def flush(self, wait: bool = False, timeout: float = 30.0):
+        """Queue a flush; only waits for it (up to timeout seconds) if wait=True, for debugging"""
+        done = threading.Event() if wait else None
+        self._enqueue(("flush", None, done))
+        if done is not None:
+            done.wait(timeout)
+
+    def shutdown(self, timeout: float = 5.0):
+        """Send everything still queued, then stop the background thread"""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _run(self):
+        spans: dict[int, Any] = {}
+        dirty = False
+
+        while True:
+            try:
+                op = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if dirty:
+                    self._call(self.client.flush)
+                    dirty = False
+                continue
+
+            if op is self._STOP:
+                self._call(self.client.flush)
+                return
+
+            kind, span_id, kwargs = op
+            if isinstance(kwargs, dict):
+                kwargs = self._resolve(kwargs)
+            if kind == "start_span":
+                spans[span_id] = self._call(self.client.start_span, **kwargs)
+            elif kind == "update":
+                if spans.get(span_id) is not None:
+                    self._call(spans[span_id].update, **kwargs)
+            elif kind == "end":
+                span = spans.pop(span_id, None)
+                if span is not None:
+                    self._call(span.end)
+            elif kind == "release":
+                spans.pop(span_id, None)
+                continue
+            elif kind == "scores":
+                # Langfuse batches these into one ingestion request on its next export
+                for name, value in kwargs:
+                    self._call(self.client.score_current_trace, name=name, value=value)
+            elif kind == "flush":
+                self._call(self.client.flush)
+                if kwargs is not None:
+                    kwargs.set()
+            else:
+                self._call(getattr(self.client, kind), **kwargs)
+            dirty = kind != "flush"
+
+    def _resolve(self, kwargs: dict[str, Any]) -> dict[str, Any]:
+        try:
+            return {key: value() if callable(value) else value for key, value in kwargs.items()}
+        except Exception:
+            self.errors += 1
+            return {}
+
+    def _call(self, fn, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            self.errors += 1
+            return None
@@ -5,7 +5,11 @@ Beautiful, simple interface for querying documents
 """
 
 import os
+import queue
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from typing import Any
 
 import streamlit as st
 from conversation import ConversationManager
@@ -15,6 +19,8 @@ from dotenv import load_dotenv
 from embeddings import EmbeddingModel
 from rag import RAGSystem
 from reranker import Reranker
+from retrieval_cache import RetrievalCache
+from streaming import coalesce_chunks
 from vector_store import VectorStore
 
 
@@ -65,33 +71,111 @@ st.markdown(
 )
 
 
+_STREAM_END = object()
+
+
 @st.cache_resource
-def init_rag_system():
-    """Initialize RAG components (cached)"""
-    with st.spinner("Initializing RAG system..."):
-        embedding_model = EmbeddingModel()
-        vector_store = VectorStore()
+def get_executor() -> ThreadPoolExecutor:
+    """Background threads running RAG queries (shared by all sessions, one thread per answer in progress)"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-ui")
+
+
+def query_in_background(rag_system: RAGSystem, **query_kwargs: Any) -> tuple[dict[str, Any], Iterator[str]]:
+    """
+    Run a streaming RAG query on the background executor
 
-        # Optional components
-        reranker = None
-        conversation_manager = None
+    The worker reads the LLM stream into a queue as tokens arrive, so generation (and saving the
+    answer to history) completes even if Streamlit stops this script run for a rerun.
 
-        if st.session_state.get("use_reranker", False):
-            reranker = Reranker()
+    Returns:
+        The query result (once retrieval is done) and an iterator over the answer tokens
+    """
+    result_future: Future = Future()
+    tokens: queue.Queue = queue.Queue()
 
+    def run():
         try:
-            conversation_manager = ConversationManager()
-        except:
-            st.warning("Redis not available - conversation history disabled")
+            result = rag_system.query(**query_kwargs, stream=True)
+        except Exception as e:
+            result_future.set_exception(e)
+            return
+        result_future.set_result(result)
+        try:
+            for chunk in result["answer_stream"]:
+                tokens.put(chunk)
+        except Exception as e:
+            tokens.put(e)
+        finally:
+            tokens.put(_STREAM_END)
 
-        rag_system = RAGSystem(
-            embedding_model=embedding_model,
-            vector_store=vector_store,
-            conversation_manager=conversation_manager,
-            reranker=reranker,
-        )
+    def answer_stream() -> Iterator[str]:
+        while (chunk := tokens.get()) is not _STREAM_END:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    get_executor().submit(run)
+    return result_future.result(), answer_stream()
+
+
+# Each heavy component is its own cached resource, so models are loaded once per process
+@st.cache_resource(show_spinner="Loading embedding model...")
+def get_embedding_model() -> EmbeddingModel:
+    """Shared embedding model"""
+    return EmbeddingModel()
+
+
+@st.cache_resource
+def get_vector_store() -> VectorStore:
+    """Shared vector store"""
+    return VectorStore()
+
+
+@st.cache_resource(show_spinner="Loading reranker...")
+def get_reranker() -> Reranker:
+    """Shared reranker model"""
+    return Reranker()
+
+
+@st.cache_resource
+def _rag_system() -> RAGSystem:
+    conversation_manager = None
+    try:
+        conversation_manager = ConversationManager()
+    except:
+        st.warning("Redis not available - conversation history disabled")
+
+    return RAGSystem(
+        embedding_model=get_embedding_model(),
+        vector_store=get_vector_store(),
+        conversation_manager=conversation_manager,
+        retrieval_cache=RetrievalCache(),
+    )
+
+
+def init_rag_system(use_reranker: bool = False) -> RAGSystem:
+    """RAG system assembled from the cached components
+
+    One instance whatever the settings (they all share its answer cache),
+    the reranker model is attached the first time reranking is enabled.
+    """
+    rag_system = _rag_system()
+    if use_reranker and rag_system.reranker is None:
+        rag_system.reranker = get_reranker()
+    return rag_system
+
+
+# Streamlit reruns the script on every interaction: cache the document stats briefly
+@st.cache_data(ttl=30)
+def list_documents() -> list[str]:
+    """Ingested document filenames (cached for 30s)"""
+    return get_vector_store().get_all_documents()
 
-    return rag_system, vector_store
+
+@st.cache_data(ttl=30)
+def count_chunks() -> int:
+    """Total number of chunks (cached for 30s)"""
+    return get_vector_store().count_chunks()
 
 
 def main():
@@ -149,8 +233,7 @@ def main():
         # Document filter
         st.markdown("#### Document Filter")
         try:
-            _, vector_store = init_rag_system()
-            docs = vector_store.get_all_documents()
+            docs = list_documents()
             filter_doc = st.selectbox("Filter by document", options=["All documents", *docs])
             filter_doc = None if filter_doc == "All documents" else filter_doc
         except:
@@ -159,7 +242,11 @@ def main():
         st.markdown("---")
         st.markdown("### 📚 Documents")
         if st.button("🔄 Refresh"):
-            st.cache_resource.clear()
+            # Rebuilds the RAG system (dropping its answer cache) but keeps the loaded models. The old instance
+            # is shared by every session: answers still streaming from it continue, and its threads and
+            # HTTP connections are released once it is no longer referenced
+            _rag_system.clear()
+            st.cache_data.clear()
             st.rerun()
 
     # Main area
@@ -169,16 +256,16 @@ def main():
         unsafe_allow_html=True,
     )
 
-    # Initialize system
-    rag_system, vector_store = init_rag_system()
+    # Initialize system (the reranker model is only loaded once reranking is enabled)
+    rag_system = init_rag_system(use_reranker=use_rerank)
 
     # Stats
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        total_docs = len(vector_store.get_all_documents())
+        total_docs = len(list_documents())
         st.metric("Documents", total_docs)
     with col2:
-        total_chunks = vector_store.count_chunks()
+        total_chunks = count_chunks()
         st.metric("Total Chunks", total_chunks)
     with col3:
         st.metric("Retrieval", "MMR" if use_mmr else "Similarity")
@@ -220,8 +307,10 @@ def main():
 
         # Get response
         with st.chat_message("assistant"):
+            # Spinner covers retrieval only; the answer is rendered as it is generated
             with st.spinner("Thinking..."):
-                result = rag_system.query(
+                result, answer_stream = query_in_background(
+                    rag_system,
                     question=prompt,
                     conversation_id=st.session_state.get("conversation_id") if use_conversation else None,
                     k=k,
@@ -231,34 +320,34 @@ def main():
                     filter_document=filter_doc,
                 )
 
-                # Display answer
-                st.markdown(result["answer"])
-
-                # Show metadata
-                with st.expander("ℹ️ Metadata"):
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Tool Used", result["tool_used"])
-                    with col2:
-                        method = result.get("retrieval_method", "N/A")
-                        st.metric("Retrieval", method)
-                    with col3:
-                        st.metric("Tokens", result["num_tokens"])
-
-                # Show sources
-                if result["sources"]:
-                    with st.expander(f"📄 Sources ({len(result['sources'])})"):
-                        for i, source in enumerate(result["sources"], 1):
-                            st.markdown(
-                                f"""
-                            <div class="source-card">
-                                <b>Source {i}</b> - {source["filename"]}<br>
-                                <small>Section: {source.get("section", "N/A")} | Score: {source["score"]:.3f}</small><br>
-                                <p style="margin-top: 0.5rem;">{source["content"]}</p>
-                            </div>
-                            """,
-                                unsafe_allow_html=True,
-                            )
+            # Display answer ("answer" and "num_tokens" are filled in once the stream is consumed)
+            st.write_stream(coalesce_chunks(answer_stream))
+
+            # Show metadata
+            with st.expander("ℹ️ Metadata"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Tool Used", result["tool_used"])
+                with col2:
+                    method = result.get("retrieval_method", "N/A")
+                    st.metric("Retrieval", method)
+                with col3:
+                    st.metric("Tokens", result["num_tokens"])
+
+            # Show sources
+            if result["sources"]:
+                with st.expander(f"📄 Sources ({len(result['sources'])})"):
+                    for i, source in enumerate(result["sources"], 1):
+                        st.markdown(
+                            f"""
+                        <div class="source-card">
+                            <b>Source {i}</b> - {source["filename"]}<br>
+                            <small>Section: {source.get("section", "N/A")} | Score: {source["score"]:.3f}</small><br>
+                            <p style="margin-top: 0.5rem;">{source["content"]}</p>
+                        </div>
+                        """,
+                            unsafe_allow_html=True,
+                        )
 
         # Save assistant message
         st.session_state.messages.append(
@@ -4,11 +4,54 @@ Simplified version inspired by Itnovem's postgresql_db_client.py
 """
 
 import json
+import threading
 from typing import Any
 
+import numpy as np
 import psycopg
-from pgvector.psycopg import Vector, register_vector
+from pgvector import HalfVector
+from pgvector.psycopg import register_vector
 from psycopg.rows import dict_row
+from psycopg.types.json import Jsonb
+from psycopg_pool import ConnectionPool
+
+
+# Quantized search: candidates fetched by Hamming distance per result, before exact rescoring
+QUANTIZED_OVERSAMPLING = 4
+
+
+def _mmr_select(embeddings: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float) -> list[int]:
+    """
+    Maximal Marginal Relevance selection
+
+    Args:
+        embeddings: (n, dim) normalized candidate embeddings, sorted by decreasing relevance
+        relevance: (n,) similarity of each candidate to the query
+        k: Number of candidates to select
+        lambda_mult: Balance between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    # Weighted once: mmr = lambda * sim(query, c) - (1 - lambda) * max sim(c, selected)
+    weighted_relevance = lambda_mult * relevance
+    diversity_weight = 1 - lambda_mult
+
+    # Start with the most similar document, then iteratively select the candidate with the best MMR
+    # score; only the similarities to the newly selected document are computed each step (one GEMV)
+    selected = [0]
+    max_sim_to_selected = embeddings @ embeddings[0]
+    mmr_scores = np.empty_like(relevance)
+
+    while len(selected) < min(k, len(relevance)):
+        np.multiply(max_sim_to_selected, diversity_weight, out=mmr_scores)
+        np.subtract(weighted_relevance, mmr_scores, out=mmr_scores)
+        mmr_scores[selected] = -np.inf
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        np.maximum(max_sim_to_selected, embeddings @ embeddings[best], out=max_sim_to_selected)
+
+    return selected
 
 
 class VectorStore:
@@ -29,10 +72,35 @@ class VectorStore:
         self.table = table
         self.vector_size = None  # Will be set when first embedding is added
 
+        # Connection pool, opened on first use (after initialize() has created the vector extension)
+        self._pool: ConnectionPool | None = None
+        self._pool_lock = threading.Lock()
+
+    def _connection(self):
+        """Borrow a pooled connection (pgvector types are registered once per connection)"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(
+                        self.connection_string,
+                        min_size=2,
+                        max_size=10,
+                        configure=register_vector,
+                        open=True,
+                    )
+        return self._pool.connection()
+
+    def close(self):
+        """Close the connection pool"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
     def initialize(self, vector_size: int = 384):
         """Create table with pgvector extension"""
         self.vector_size = vector_size
 
+        # Direct connection: pooled connections register the vector type, which needs the extension
         with psycopg.connect(self.connection_string) as conn:
             with conn.cursor() as cur:
                 # Enable pgvector extension
@@ -47,125 +115,169 @@ class VectorStore:
                         id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
                         content TEXT NOT NULL,
                         metadata JSONB NOT NULL,
-                        embedding vector({vector_size}) NOT NULL,
+                        embedding halfvec({vector_size}) NOT NULL,
                         created_at TIMESTAMP DEFAULT NOW()
                     );
                 """)
 
-                # Create index for vector similarity search (using cosine distance)
+                # Filename extracted once at write time, so per-document filters compare a plain indexed column
                 cur.execute(f"""
-                    CREATE INDEX IF NOT EXISTS {self.table}_embedding_idx
+                    ALTER TABLE {self.schema}.{self.table}
+                    ADD COLUMN IF NOT EXISTS filename TEXT GENERATED ALWAYS AS (metadata->>'filename') STORED;
+                """)
+
+                # Embeddings are stored as FP16 halfvec (half the size of vector, same top-k in practice);
+                # convert tables created with a full-precision vector column, dropping their old indexes
+                cur.execute(
+                    "SELECT format_type(atttypid, atttypmod) FROM pg_attribute"
+                    " WHERE attrelid = %s::regclass AND attname = 'embedding'",
+                    (f"{self.schema}.{self.table}",),
+                )
+                if cur.fetchone()[0].startswith("vector"):
+                    cur.execute(f"DROP INDEX IF EXISTS {self.schema}.{self.table}_embedding_idx;")
+                    cur.execute(f"DROP INDEX IF EXISTS {self.schema}.{self.table}_embedding_ip_idx;")
+                    cur.execute(f"DROP INDEX IF EXISTS {self.schema}.{self.table}_embedding_hnsw_idx;")
+                    cur.execute(
+                        f"ALTER TABLE {self.schema}.{self.table} ALTER COLUMN embedding TYPE halfvec({vector_size});"
+                    )
+
+                # Binary-quantized copy of each embedding (1 bit per dimension) for the first stage of quantized search
+                cur.execute(f"""
+                    ALTER TABLE {self.schema}.{self.table}
+                    ADD COLUMN IF NOT EXISTS embedding_bits bit({vector_size})
+                    GENERATED ALWAYS AS (binary_quantize(embedding)::bit({vector_size})) STORED;
+                """)
+
+                # Create index for vector similarity search (inner product on normalized embeddings).
+                # Replaces the original cosine ivfflat index, which <#> queries can't use but every write maintains
+                cur.execute(f"DROP INDEX IF EXISTS {self.schema}.{self.table}_embedding_idx;")
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {self.table}_embedding_halfvec_idx
+                    ON {self.schema}.{self.table}
+                    USING hnsw (embedding halfvec_ip_ops)
+                    WITH (m = 16, ef_construction = 64);
+                """)
+
+                # Hamming-distance index over the quantized embeddings (a fraction of the halfvec index size)
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {self.table}_embedding_bits_idx
                     ON {self.schema}.{self.table}
-                    USING ivfflat (embedding vector_cosine_ops)
-                    WITH (lists = 100);
+                    USING hnsw (embedding_bits bit_hamming_ops)
+                    WITH (m = 16, ef_construction = 64);
                 """)
 
-                # Create GIN index for metadata searches (like document name)
+                # Create GIN index for metadata containment filters (@>); jsonb_path_ops only supports containment
+                # but is a fraction of the default opclass size and faster to scan. Replaces the older default index
+                cur.execute(f"DROP INDEX IF EXISTS {self.schema}.{self.table}_metadata_idx;")
                 cur.execute(f"""
-                    CREATE INDEX IF NOT EXISTS {self.table}_metadata_idx
+                    CREATE INDEX IF NOT EXISTS {self.table}_metadata_path_idx
                     ON {self.schema}.{self.table}
-                    USING GIN (metadata);
+                    USING GIN (metadata jsonb_path_ops);
+                """)
+
+                # Btree on the filename for filtered search, DISTINCT listing and per-document counts/deletes
+                cur.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {self.table}_filename_idx
+                    ON {self.schema}.{self.table} (filename);
                 """)
 
                 conn.commit()
 
-    def insert_chunks(self, chunks: list[dict[str, Any]]) -> int:
+    def insert_chunks(self, chunks: list[dict[str, Any]], embeddings: np.ndarray | None = None) -> int:
         """
         Insert document chunks with embeddings
 
         Args:
-            chunks: List of dicts with 'content', 'metadata', 'embedding'
+            chunks: List of dicts with 'content', 'metadata' (and 'embedding' if embeddings is None)
+            embeddings: Optional (len(chunks), dim) array, one row per chunk.
+                Rows are sent through the pgvector numpy adapter (stored as FP16) without Python list conversion.
 
         Returns:
             Number of chunks inserted
         """
-        with psycopg.connect(self.connection_string) as conn:
-            # Register vector type
-            register_vector(conn)
+        if embeddings is None:
+            embeddings = [chunk["embedding"] for chunk in chunks]
+
+        # Same binary COPY path as bulk ingestion (one round-trip instead of one INSERT per chunk)
+        return self.insert_chunks_bulk(
+            [chunk["content"] for chunk in chunks],
+            [chunk["metadata"] for chunk in chunks],
+            embeddings,
+        )
+
+    def insert_chunks_bulk(
+        self,
+        texts: list[str],
+        metadatas: list[dict[str, Any]],
+        embeddings: np.ndarray | list[list[float]],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Bulk insert chunks with binary COPY (much faster than row-by-row INSERT)
+
+        Args:
+            texts: Chunk contents
+            metadatas: Chunk metadata, one per text
+            embeddings: (len(texts), dim) array (or list of vectors), one row per text
+            batch_size: Number of rows per COPY statement
+
+        Returns:
+            Number of chunks inserted
+        """
+        with self._connection() as conn:
             with conn.cursor() as cur:
-                for chunk in chunks:
-                    cur.execute(
-                        f"""
-                        INSERT INTO {self.schema}.{self.table}
-                        (content, metadata, embedding)
-                        VALUES (%s, %s, %s)
-                    """,
-                        (
-                            chunk["content"],
-                            json.dumps(chunk["metadata"]),
-                            chunk["embedding"],
-                        ),
-                    )
+                for start in range(0, len(texts), batch_size):
+                    end = start + batch_size
+                    with cur.copy(
+                        f"COPY {self.schema}.{self.table} (content, metadata, embedding) FROM STDIN (FORMAT BINARY)"
+                    ) as copy:
+                        copy.set_types(["text", "jsonb", "halfvec"])
+                        for text, metadata, embedding in zip(
+                            texts[start:end], metadatas[start:end], embeddings[start:end], strict=True
+                        ):
+                            copy.write_row((text, Jsonb(metadata), embedding))
                 conn.commit()
 
-        return len(chunks)
+        return len(texts)
 
     def similarity_search(
         self,
-        query_embedding: list[float],
+        query_embedding: list[float] | np.ndarray,
         k: int = 5,
         filter_metadata: dict[str, Any] | None = None,
+        prefilter: bool = False,
+        quantized: bool = False,
     ) -> list[tuple[dict[str, Any], float]]:
         """
         Perform similarity search using cosine similarity
+        (inner product, embeddings are normalized)
 
         Args:
             query_embedding: Query vector
             k: Number of results to return
             filter_metadata: Optional metadata filter (e.g., {'filename': 'doc.pdf'})
+            prefilter: Apply the filter before ranking (exact search over the matching rows)
+                instead of filtering the approximate index scan
+            quantized: Two-stage search: fetch QUANTIZED_OVERSAMPLING * k candidates by Hamming distance
+                on the binary-quantized embeddings, then rank them by exact similarity
 
         Returns:
-            List of (chunk, similarity_score) tuples
+            List of (chunk, similarity_score) tuples (chunk metadata only holds filename and section)
         """
-        with psycopg.connect(self.connection_string, row_factory=dict_row) as conn:
-            # Register vector type
-            register_vector(conn)
-            with conn.cursor() as cur:
-                # Build query
-                where_clause = ""
-                params = [query_embedding, k]
-
-                if filter_metadata:
-                    # Build JSONB containment filter
-                    where_clause = "WHERE metadata @> %s"
-                    params.insert(0, json.dumps(filter_metadata))
-
-                query = f"""
-                    SELECT
-                        id,
-                        content,
-                        metadata,
-                        1 - (embedding <=> %s::vector) as similarity
-                    FROM {self.schema}.{self.table}
-                    {where_clause}
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                """
-
-                if filter_metadata:
-                    cur.execute(
-                        query,
-                        (
-                            json.dumps(filter_metadata),
-                            Vector(query_embedding),
-                            Vector(query_embedding),
-                            k,
-                        ),
-                    )
-                else:
-                    cur.execute(query, (Vector(query_embedding), Vector(query_embedding), k))
+        with self._connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                results = self._nearest(cur, query_embedding, k, filter_metadata, prefilter, quantized=quantized)
 
-                results = cur.fetchall()
-
-                return [(dict(row), row["similarity"]) for row in results]
+                return [(self._to_chunk(row), row["similarity"]) for row in results]
 
     def mmr_search(
         self,
-        query_embedding: list[float],
+        query_embedding: list[float] | np.ndarray,
         k: int = 5,
         lambda_mult: float = 0.5,
         fetch_k: int = 20,
         filter_metadata: dict[str, Any] | None = None,
+        prefilter: bool = False,
     ) -> list[tuple[dict[str, Any], float]]:
         """
         Maximal Marginal Relevance search for diversity
@@ -176,102 +288,160 @@ class VectorStore:
             lambda_mult: Balance between relevance (1.0) and diversity (0.0)
             fetch_k: Number of candidates to consider
             filter_metadata: Optional metadata filter
+            prefilter: Apply the filter before ranking (see similarity_search)
 
         Returns:
             List of (chunk, score) tuples
         """
 
-        with psycopg.connect(self.connection_string, row_factory=dict_row) as conn:
-            # Register vector type
-            register_vector(conn)
-            with conn.cursor() as cur:
-                # Build WHERE clause
-                where_clause = ""
-                if filter_metadata:
-                    where_clause = "WHERE metadata @> %s::jsonb"
-
-                # 1. Get initial candidates (fetch_k most similar)
-                query = f"""
-                    SELECT
-                        id,
-                        content,
-                        metadata,
-                        1 - (embedding <=> %s::vector) as similarity
-                    FROM {self.schema}.{self.table}
-                    {where_clause}
-                    ORDER BY embedding <=> %s::vector
-                    LIMIT %s
-                """
+        with self._connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
+                # 1. Get initial candidates (fetch_k most similar) with their embeddings
+                candidates = self._nearest(
+                    cur, query_embedding, fetch_k, filter_metadata, prefilter, with_embeddings=True
+                )
 
-                if filter_metadata:
-                    cur.execute(
-                        query,
-                        (
-                            json.dumps(filter_metadata),
-                            Vector(query_embedding),
-                            Vector(query_embedding),
-                            fetch_k,
-                        ),
+        if not candidates:
+            return []
+
+        # 2. Candidate embeddings, already float32 numpy arrays (normalized, so dot products are cosine similarities)
+        embeddings = np.stack([candidate["embedding"] for candidate in candidates]).astype(np.float32, copy=False)
+        relevance = np.array([candidate["similarity"] for candidate in candidates], dtype=np.float32)
+
+        # 3. Pick k candidates balancing relevance and diversity
+        selected = _mmr_select(embeddings, relevance, k, lambda_mult)
+
+        # 4. Format results
+        return [(self._to_chunk(candidates[i]), candidates[i]["similarity"]) for i in selected]
+
+    @staticmethod
+    def _to_chunk(row: dict[str, Any]) -> dict[str, Any]:
+        """Search row -> chunk dict (searches only fetch the metadata fields shown downstream)"""
+        return {
+            "id": row["id"],
+            "content": row["content"],
+            "metadata": {"filename": row["filename"], "section": row["section"]},
+        }
+
+    @staticmethod
+    def _filter_condition(filter_metadata: dict[str, Any] | None) -> tuple[str, Any]:
+        """SQL condition (bound to %(filter)s) and its parameter for a metadata filter"""
+        if not filter_metadata:
+            return "", None
+        if filter_metadata.keys() == {"filename"}:
+            # Indexed generated column
+            return "filename = %(filter)s", filter_metadata["filename"]
+        # JSONB containment filter (GIN jsonb_path_ops index)
+        return "metadata @> %(filter)s::jsonb", json.dumps(filter_metadata)
+
+    @staticmethod
+    def _set_ef_search(cur: psycopg.Cursor, limit: int):
+        """Size the HNSW candidate list for this transaction: 4x the rows needed (capped at 1000)"""
+        # SET LOCAL can't take a bound parameter, set_config(..., true) is its parameterized equivalent
+        cur.execute(
+            "SELECT set_config('hnsw.ef_search', %s, true)", (str(min(1000, max(40, 4 * limit))),), prepare=True
+        )
+
+    def _nearest(
+        self,
+        cur: psycopg.Cursor,
+        query_embedding: list[float] | np.ndarray,
+        limit: int,
+        filter_metadata: dict[str, Any] | None,
+        prefilter: bool,
+        with_embeddings: bool = False,
+        quantized: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Fetch the `limit` rows closest to the query, optionally filtered by metadata"""
+        self._set_ef_search(cur, QUANTIZED_OVERSAMPLING * limit if quantized else limit)
+        # Embeddings are fetched in binary format: the pgvector loader reads the raw float32 payload straight into
+        # a numpy array instead of parsing the '[0.1,0.2,...]' text form of every candidate.
+        # The SQL only varies with the filter/MMR options, so it is prepared once per pooled connection
+        # (psycopg keeps the statement and its plan, later calls only send the parameters)
+        cur.execute(
+            *self._nearest_query(query_embedding, limit, filter_metadata, prefilter, with_embeddings, quantized),
+            prepare=True,
+            binary=with_embeddings,
+        )
+        return cur.fetchall()
+
+    def _nearest_query(
+        self,
+        query_embedding: list[float] | np.ndarray,
+        limit: int,
+        filter_metadata: dict[str, Any] | None,
+        prefilter: bool,
+        with_embeddings: bool = False,
+        quantized: bool = False,
+    ) -> tuple[str, dict[str, Any]]:
+        """Nearest-neighbour SQL and its parameters"""
+        # Named binary placeholder: the query vector is sent once, as raw FP16 bytes (no text serialization/parsing),
+        # even though it is used twice
+        params: dict[str, Any] = {"query": HalfVector(query_embedding), "limit": limit}
+        source = f"{self.schema}.{self.table}"
+        columns = "id, content, metadata, embedding"
+        if quantized:
+            columns += ", embedding_bits"
+        ctes = []
+        where_clause = ""
+
+        condition, params["filter"] = self._filter_condition(filter_metadata)
+        if condition:
+            if prefilter:
+                # Materialized CTE: the filter index narrows rows first, then distances are computed
+                # exactly over that subset, so the filter cannot starve the HNSW index scan
+                ctes.append(f"""
+                    filtered AS MATERIALIZED (
+                        SELECT {columns}
+                        FROM {source}
+                        WHERE {condition}
                     )
-                else:
-                    cur.execute(query, (Vector(query_embedding), Vector(query_embedding), fetch_k))
-
-                candidates = cur.fetchall()
-
-                if not candidates:
-                    return []
-
-                # 2. Simple MMR: Select diverse results
-                # Start with the most similar document
-                selected = [candidates[0]]
-                remaining = candidates[1:]
-
-                # 3. Iteratively select documents that maximize MMR score
-                while len(selected) < k and remaining:
-                    mmr_scores = []
-
-                    for candidate in remaining:
-                        # Relevance to query (already have similarity score)
-                        relevance = candidate["similarity"]
-
-                        # Max similarity to already selected docs (diversity penalty)
-                        # For simplicity, use content length difference as proxy
-                        max_sim_to_selected = 0
-                        for sel in selected:
-                            # Simple diversity: penalize similar content lengths
-                            len_diff = abs(len(candidate["content"]) - len(sel["content"]))
-                            similarity = 1.0 / (1.0 + len_diff / 100)  # Normalize
-                            max_sim_to_selected = max(max_sim_to_selected, similarity)
-
-                        # MMR score: balance relevance and diversity
-                        mmr_score = lambda_mult * relevance - (1 - lambda_mult) * max_sim_to_selected
-                        mmr_scores.append((candidate, mmr_score))
-
-                    # Select document with highest MMR score
-                    if mmr_scores:
-                        best_candidate, best_score = max(mmr_scores, key=lambda x: x[1])
-                        selected.append(best_candidate)
-                        remaining.remove(best_candidate)
-
-                # 4. Format results
-                results = []
-                for doc in selected[:k]:
-                    chunk = {
-                        "id": doc["id"],
-                        "content": doc["content"],
-                        "metadata": doc["metadata"],
-                    }
-                    results.append((chunk, doc["similarity"]))
-
-                return results
+                """)
+                source = "filtered"
+            else:
+                where_clause = f"WHERE {condition}"
+
+        if quantized:
+            # Stage 1: nearest candidates by Hamming distance on the binary-quantized embeddings (bit index, ~16x
+            # less data than halfvec); stage 2 below ranks them by exact similarity on the stored embeddings
+            params["candidates"] = QUANTIZED_OVERSAMPLING * limit
+            ctes.append(f"""
+                candidates AS MATERIALIZED (
+                    SELECT id, content, metadata, embedding
+                    FROM {source}
+                    {where_clause}
+                    ORDER BY embedding_bits <~> binary_quantize(%(query)b::halfvec)
+                    LIMIT %(candidates)s
+                )
+            """)
+            source = "candidates"
+            where_clause = ""
+
+        with_clause = "WITH " + ", ".join(ctes) if ctes else ""
+        embedding_column = "embedding::vector AS embedding," if with_embeddings else ""
+        query = f"""
+            {with_clause}
+            SELECT
+                id,
+                content,
+                metadata->>'filename' AS filename,
+                metadata->>'section' AS section,
+                {embedding_column}
+                -(embedding <#> %(query)b::halfvec) as similarity
+            FROM {source}
+            {where_clause}
+            ORDER BY embedding <#> %(query)b::halfvec
+            LIMIT %(limit)s
+        """
+        return query, params
 
     def count_chunks(self, filename: str | None = None) -> int:
         """Count chunks, optionally filtered by filename"""
-        with psycopg.connect(self.connection_string) as conn:
+        with self._connection() as conn:
             with conn.cursor() as cur:
                 if filename:
                     cur.execute(
-                        f"SELECT COUNT(*) FROM {self.schema}.{self.table} WHERE metadata->>'filename' = %s",
+                        f"SELECT COUNT(*) FROM {self.schema}.{self.table} WHERE filename = %s",
                         (filename,),
                     )
                 else:
@@ -280,12 +450,10 @@ class VectorStore:
 
     def get_all_documents(self) -> list[str]:
         """Get all unique document filenames"""
-        with psycopg.connect(self.connection_string, row_factory=dict_row) as conn:
-            # Register vector type
-            register_vector(conn)
-            with conn.cursor() as cur:
+        with self._connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cur:
                 cur.execute(f"""
-                    SELECT DISTINCT metadata->>'filename' as filename
+                    SELECT DISTINCT filename
                     FROM {self.schema}.{self.table}
                     ORDER BY filename
                 """)
@@ -293,10 +461,10 @@ class VectorStore:
 
     def delete_document(self, filename: str) -> int:
         """Delete all chunks from a document"""
-        with psycopg.connect(self.connection_string) as conn:
+        with self._connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    f"DELETE FROM {self.schema}.{self.table} WHERE metadata->>'filename' = %s",
+                    f"DELETE FROM {self.schema}.{self.table} WHERE filename = %s",
                     (filename,),
                 )
                 conn.commit()
@@ -3,6 +3,10 @@ Web Search Tool
 Provides web search capabilities as fallback when RAG doesn't have the answer
 """
 
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from duckduckgo_search import DDGS
@@ -11,9 +15,27 @@ from duckduckgo_search import DDGS
 class WebSearchTool:
     """Simple web search using DuckDuckGo"""
 
-    def __init__(self, max_results: int = 3):
+    def __init__(self, max_results: int = 3, cache_size: int = 256, cache_ttl: float = 300.0, max_workers: int = 4):
         self.max_results = max_results
-        self.ddgs = DDGS()
+
+        # One persistent DDGS client per thread (its HTTP session is not shared between threads)
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+
+        # LRU of recent (query, max_results) -> (time fetched, results); web results are time-sensitive,
+        # so entries expire after cache_ttl seconds
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache_lock = threading.Lock()
+        self._cache: OrderedDict[tuple[str, int], tuple[float, list[dict[str, Any]]]] = OrderedDict()
+
+    @property
+    def ddgs(self) -> DDGS:
+        """DDGS client of the current thread"""
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            ddgs = self._local.ddgs = DDGS()
+        return ddgs
 
     def search(self, query: str, max_results: int | None = None) -> list[dict[str, Any]]:
         """
@@ -28,6 +50,16 @@ class WebSearchTool:
         """
         max_results = max_results or self.max_results
 
+        key = (query, max_results)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                fetched_at, cached_results = cached
+                if time.monotonic() - fetched_at < self.cache_ttl:
+                    self._cache.move_to_end(key)
+                    return [dict(result) for result in cached_results]
+                del self._cache[key]
+
         try:
             results = []
             search_results = self.ddgs.text(query, max_results=max_results)
@@ -41,12 +73,35 @@ class WebSearchTool:
                     }
                 )
 
+            if results:
+                # The cache keeps its own copies: callers may modify the returned results
+                with self._cache_lock:
+                    self._cache[key] = (time.monotonic(), [dict(result) for result in results])
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
             return results
 
         except Exception as e:
             print(f"Web search error: {e}")
             return []
 
+    def close(self):
+        """Stop the search worker threads"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def search_many(self, queries: list[str], max_results: int | None = None) -> list[list[dict[str, Any]]]:
+        """
+        Run several searches concurrently
+
+        Args:
+            queries: Search queries
+            max_results: Number of results per query (default: self.max_results)
+
+        Returns:
+            One list of search results per query, in input order
+        """
+        return list(self._pool.map(lambda query: self.search(query, max_results), queries))
+
     def format_results_for_context(self, results: list[dict[str, Any]]) -> str:
         """
         Format search results for LLM context
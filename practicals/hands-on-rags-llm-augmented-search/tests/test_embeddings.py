@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the EmbeddingModel query cache
+The SentenceTransformer is replaced by a stub, no model is downloaded
+"""
+
+import sys
+from pathlib import Path
+
+
+# Modules import each other by flat name
+src_path = Path(__file__).parent.parent / "src" / "demo_indabax"
+sys.path.insert(0, str(src_path))
+
+
+import numpy as np
+import pytest
+from embeddings import EmbeddingModel
+
+
+class StubSentenceTransformer:
+    """Stand-in SentenceTransformer counting the texts it encodes"""
+
+    def __init__(self):
+        self.encoded: list[str] = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 4
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        batch = [texts] if isinstance(texts, str) else texts
+        self.encoded += batch
+        embeddings = np.array([[len(text), 1, 0, 0] for text in batch], dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings[0] if isinstance(texts, str) else embeddings
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setattr(EmbeddingModel, "_load_model", staticmethod(lambda *args: StubSentenceTransformer()))
+    return EmbeddingModel(cache_size=10)
+
+
+def test_repeated_query_is_encoded_once(model):
+    first = model.embed_text("what is the method?")
+    assert np.array_equal(model.embed_text("what is the method?"), first)
+    assert model.model.encoded == ["what is the method?"]
+
+
+def test_documents_bypass_query_cache(model):
+    model.embed_text("query")
+    documents = model.embed_documents(["chunk one", "query"], show_progress=False)
+
+    assert np.array_equal(documents[1], model.embed_text("query"))
+    assert model.model.encoded == ["query", "chunk one", "query"]
+    # Only the query was cached
+    assert len(model._cache) == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Unit tests for RAGSystem
+No database, Redis, LLM or network calls are made
+"""
+
+import gc
+import sys
+from pathlib import Path
+
+
+# Modules import each other by flat name
+src_path = Path(__file__).parent.parent / "src" / "demo_indabax"
+sys.path.insert(0, str(src_path))
+
+
+import numpy as np
+import pytest
+from rag import RAGSystem
+
+
+def _unit(values: list[float]) -> np.ndarray:
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class StubEmbeddingModel:
+    """Stand-in for EmbeddingModel returning fixed embeddings and counting calls"""
+
+    model_name = "test-model"
+    dimension = 4
+
+    def __init__(self, embeddings: dict[str, np.ndarray] | None = None):
+        self.embeddings = embeddings or {}
+        self.calls = 0
+
+    def embed_text(self, text: str) -> np.ndarray:
+        self.calls += 1
+        return self.embeddings.get(text, _unit([0, 0, 0, 1]))
+
+
+class EmptyVectorStore:
+    """Stand-in VectorStore with no documents"""
+
+    def similarity_search(self, *args, **kwargs):
+        return []
+
+
+class StubRetrievalCache:
+    """Stand-in RetrievalCache: fixed document generation, every lookup misses"""
+
+    def generation(self) -> int:
+        return 0
+
+    def get_embedding(self, *args):
+        return None
+
+    def put_embedding(self, *args):
+        pass
+
+    def get_results(self, *args):
+        return 0, None
+
+    def put_results(self, *args, **kwargs):
+        pass
+
+
+# Answer cache parameters of a default query: (k, use_mmr, use_rerank, eco_mode, filter_document, generation)
+PARAMS = (5, False, False, False, None, 0)
+
+
+@pytest.fixture
+def rag_system():
+    system = RAGSystem(embedding_model=StubEmbeddingModel(), vector_store=None, llm_api_key="test", cache_size=2)
+    yield system
+    system.close()
+
+
+@pytest.fixture
+def cached_rag_system():
+    """RAG system over an empty document store, with the answer cache enabled"""
+    system = RAGSystem(
+        embedding_model=StubEmbeddingModel({"What is the method?": _unit([1, 0.01, 0, 0])}),
+        vector_store=EmptyVectorStore(),
+        llm_api_key="test",
+        enable_web_search=False,
+        retrieval_cache=StubRetrievalCache(),
+    )
+    yield system
+    system.close()
+
+
+@pytest.mark.parametrize(
+    ("question", "tool"),
+    [
+        # Trivial inputs skip the keyword scan
+        ("ok", "direct_llm"),
+        (" ? ", "direct_llm"),
+        ("Hello, how are you?", "direct_llm"),
+        ("Good morning assistant", "direct_llm"),
+        ("What does the paper conclude?", "rag"),
+        ("Explain the methodology", "rag"),
+        ("What is the weather today?", "web_search"),
+        ("Who won the final yesterday?", "web_search"),
+        # Whole-word matching: "history" contains "hi", "newsletter" contains "news"
+        ("Summarize the history section", "rag"),
+        ("Describe the newsletter format", "rag"),
+        # Web questions naming the documents search both
+        ("What is the latest news about the topic of this document?", "hybrid"),
+        # Generic phrases ("in the") must not turn web questions into hybrid ones
+        ("latest news in the world", "web_search"),
+        ("weather in the capital", "web_search"),
+    ],
+)
+def test_route_to_tool(rag_system, question, tool):
+    assert rag_system._route_to_tool(question) == tool
+
+
+def test_route_without_web_search_is_never_hybrid():
+    system = RAGSystem(
+        embedding_model=StubEmbeddingModel(), vector_store=None, llm_api_key="test", enable_web_search=False
+    )
+    try:
+        assert system._route_to_tool("latest news in this document") == "web_search"
+    finally:
+        system.close()
+
+
+def test_answer_cache_exact_and_semantic_hits(rag_system):
+    result = {"answer": "42", "sources": []}
+    rag_system._cache_store(("what is it", PARAMS), _unit([1, 0, 0, 0]), result)
+
+    assert rag_system._cache_lookup(("what is it", PARAMS)) is result
+    # Different wording, near-identical embedding, same parameters
+    assert rag_system._cache_lookup_similar(("what's it", PARAMS), _unit([1, 0.01, 0, 0])) is result
+
+
+def test_answer_cache_misses(rag_system):
+    rag_system._cache_store(("what is it", PARAMS), _unit([1, 0, 0, 0]), {"answer": "42", "sources": []})
+
+    assert rag_system._cache_lookup(("something else", PARAMS)) is None
+    assert rag_system._cache_lookup_similar(("something else", PARAMS), _unit([0, 1, 0, 0])) is None
+    # Same question, documents changed since (new generation)
+    new_generation = (*PARAMS[:-1], 1)
+    assert rag_system._cache_lookup(("what is it", new_generation)) is None
+    assert rag_system._cache_lookup_similar(("what is it", new_generation), _unit([1, 0, 0, 0])) is None
+
+
+def test_answer_cache_evicts_least_recently_used(rag_system):
+    for i, question in enumerate(["q0", "q1", "q2"]):
+        embedding = np.zeros(4, dtype=np.float32)
+        embedding[i] = 1
+        rag_system._cache_store((question, PARAMS), embedding, {"answer": question, "sources": []})
+
+    assert rag_system._cache_lookup(("q0", PARAMS)) is None
+    assert rag_system._cache_lookup_similar(("q0", PARAMS), _unit([1, 0, 0, 0])) is None
+    assert rag_system._cache_lookup(("q2", PARAMS))["answer"] == "q2"
+
+
+def test_cached_greeting_is_not_embedded(cached_rag_system):
+    cached_rag_system._cache_store(("hello there", PARAMS), None, {"answer": "Hi!", "sources": [], "num_tokens": 0})
+
+    assert cached_rag_system.query("Hello   there")["answer"] == "Hi!"
+    assert cached_rag_system.embedding_model.calls == 0
+
+
+def test_document_question_embedded_once(cached_rag_system):
+    result = cached_rag_system.query("What does the paper conclude?")
+
+    assert result["tool_used"] == "rag"
+    # Semantic cache lookup and retrieval share one embedding
+    assert cached_rag_system.embedding_model.calls == 1
+    # The answer (no documents found) is now cached
+    assert cached_rag_system.query("what does the paper conclude?")["answer"] == result["answer"]
+    assert cached_rag_system.embedding_model.calls == 1
+
+
+def test_semantically_similar_question_hits_cache(cached_rag_system):
+    cached = {"answer": "Surveys", "sources": [], "num_tokens": 0}
+    cached_rag_system._cache_store(("which method is used?", PARAMS), _unit([1, 0, 0, 0]), cached)
+
+    assert cached_rag_system.query("What is the method?")["answer"] == "Surveys"
+
+
+def test_cached_sources_are_copies(cached_rag_system):
+    cached = {"answer": "42", "sources": [{"filename": "a.pdf", "score": 0.9}], "num_tokens": 0}
+    cached_rag_system._cache_store(("what is the method?", PARAMS), None, cached)
+
+    result = cached_rag_system.query("What is the method?")
+    result["sources"][0]["filename"] = "modified.pdf"
+    result["sources"].clear()
+
+    assert cached_rag_system.query("What is the method?")["sources"] == [{"filename": "a.pdf", "score": 0.9}]
+
+
+def test_unreferenced_system_releases_connections():
+    system = RAGSystem(embedding_model=StubEmbeddingModel(), vector_store=None, llm_api_key="test")
+    llm = system.llm
+    assert not llm.is_closed()
+
+    # e.g. the Streamlit resource cache was cleared and the last query using it finished
+    del system
+    gc.collect()
+    assert llm.is_closed()
+
+
+def test_close_releases_connections_once(rag_system):
+    rag_system.close()
+    rag_system.close()
+    assert rag_system.llm.is_closed()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
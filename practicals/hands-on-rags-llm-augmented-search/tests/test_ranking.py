@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Unit tests for result ranking
+No database, Redis or network needed
+"""
+
+import sys
+from pathlib import Path
+
+
+# Modules import each other by flat name
+src_path = Path(__file__).parent.parent / "src" / "demo_indabax"
+sys.path.insert(0, str(src_path))
+
+
+import numpy as np
+from rag import _reciprocal_rank_fusion
+from vector_store import _mmr_select
+
+
+def _normalized(rows: list[list[float]]) -> np.ndarray:
+    vectors = np.array(rows, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_mmr_starts_with_most_relevant():
+    embeddings = _normalized([[1, 0], [0, 1], [1, 1]])
+    relevance = np.array([0.9, 0.5, 0.7], dtype=np.float32)
+    assert _mmr_select(embeddings, relevance, k=1, lambda_mult=0.5) == [0]
+
+
+def test_mmr_prefers_diverse_candidate():
+    # Candidate 1 duplicates candidate 0; candidate 2 is less relevant but different
+    embeddings = _normalized([[1, 0], [1, 0], [0, 1]])
+    relevance = np.array([0.9, 0.89, 0.6], dtype=np.float32)
+    assert _mmr_select(embeddings, relevance, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_mmr_pure_relevance_keeps_similarity_order():
+    embeddings = _normalized([[1, 0], [1, 0.1], [0, 1]])
+    relevance = np.array([0.9, 0.8, 0.1], dtype=np.float32)
+    assert _mmr_select(embeddings, relevance, k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_mmr_k_larger_than_candidates():
+    embeddings = _normalized([[1, 0], [0, 1]])
+    relevance = np.array([0.9, 0.5], dtype=np.float32)
+    assert sorted(_mmr_select(embeddings, relevance, k=5, lambda_mult=0.5)) == [0, 1]
+
+
+def test_rrf_interleaves_rankings():
+    # Equal ranks tie on score; the earlier ranking wins the tie. Only the top k are kept
+    fused = _reciprocal_rank_fusion(["d1", "d2", "d3"], ["w1", "w2"], k=4)
+    assert fused == [(0, "d1"), (1, "w1"), (0, "d2"), (1, "w2")]
+
+
+def test_rrf_with_an_empty_ranking():
+    assert _reciprocal_rank_fusion(["d1", "d2"], [], k=5) == [(0, "d1"), (0, "d2")]
+    assert _reciprocal_rank_fusion([], ["w1"], k=5) == [(1, "w1")]
+
+
+if __name__ == "__main__":
+    sys.exit(__import__("pytest").main([__file__, "-q"]))
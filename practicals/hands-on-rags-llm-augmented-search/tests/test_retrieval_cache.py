@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for RetrievalCache
+Requires a Redis server on localhost (skipped otherwise); uses database 15, which is flushed
+"""
+
+import sys
+from pathlib import Path
+
+
+# Modules import each other by flat name
+src_path = Path(__file__).parent.parent / "src" / "demo_indabax"
+sys.path.insert(0, str(src_path))
+
+
+import pytest
+import redis
+from retrieval_cache import RetrievalCache
+
+
+PARAMS = ("test-model", "what is the method?", 5, False, False, None)
+RESULTS = [({"content": "Surveys", "filename": "a.pdf"}, 0.9)]
+
+
+@pytest.fixture
+def cache():
+    cache = RetrievalCache(db=15)
+    try:
+        cache.client.flushdb()
+    except redis.RedisError:
+        pytest.skip("Redis not available")
+    yield cache
+    cache.client.flushdb()
+
+
+def test_results_round_trip(cache):
+    generation, cached = cache.get_results(*PARAMS)
+    assert cached is None
+
+    cache.put_results(RESULTS, generation, *PARAMS)
+    assert cache.get_results(*PARAMS) == (generation, [({"content": "Surveys", "filename": "a.pdf"}, 0.9)])
+
+
+def test_results_ignored_after_invalidation(cache):
+    generation, _ = cache.get_results(*PARAMS)
+    cache.put_results(RESULTS, generation, *PARAMS)
+
+    cache.invalidate()
+    assert cache.get_results(*PARAMS) == (generation + 1, None)
+
+
+def test_results_searched_before_invalidation_not_cached(cache):
+    generation, _ = cache.get_results(*PARAMS)
+    # A document is ingested while the search runs: its results may be stale
+    cache.invalidate()
+    cache.put_results(RESULTS, generation, *PARAMS)
+
+    assert cache.get_results(*PARAMS) == (generation + 1, None)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
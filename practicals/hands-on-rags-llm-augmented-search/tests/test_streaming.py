@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Unit tests for streamed answer helpers
+"""
+
+import sys
+from pathlib import Path
+
+
+# Modules import each other by flat name
+src_path = Path(__file__).parent.parent / "src" / "demo_indabax"
+sys.path.insert(0, str(src_path))
+
+
+from streaming import coalesce_chunks
+
+
+def test_tokens_within_interval_are_joined():
+    assert list(coalesce_chunks(iter(["a", "b", "c"]), interval=3600)) == ["abc"]
+
+
+def test_tokens_flushed_after_interval():
+    assert list(coalesce_chunks(iter(["a", "b"]), interval=0)) == ["a", "b"]
+
+
+def test_empty_stream():
+    assert list(coalesce_chunks(iter([]))) == []
+
+
+if __name__ == "__main__":
+    sys.exit(__import__("pytest").main([__file__, "-q"]))
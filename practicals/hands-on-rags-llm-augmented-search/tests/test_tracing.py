@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the background Langfuse processor
+No Langfuse server needed: the client is replaced by a stand-in
+"""
+
+import gc
+import sys
+import weakref
+from pathlib import Path
+
+
+# Modules import each other by flat name
+src_path = Path(__file__).parent.parent / "src" / "demo_indabax"
+sys.path.insert(0, str(src_path))
+
+
+from tracing import AsyncLangfuseProcessor
+
+
+class RecordingSpan:
+    def __init__(self):
+        self.updates = []
+        self.ended = False
+
+    def update(self, **kwargs):
+        self.updates.append(kwargs)
+
+    def end(self):
+        self.ended = True
+
+
+class RecordingClient:
+    """Stand-in Langfuse client keeping weak references to the spans it created"""
+
+    def __init__(self):
+        self.spans: list[weakref.ref] = []
+
+    def start_span(self, **kwargs):
+        span = RecordingSpan()
+        self.spans.append(weakref.ref(span))
+        return span
+
+    def flush(self):
+        pass
+
+
+def test_dropped_span_handles_are_released():
+    client = RecordingClient()
+    processor = AsyncLangfuseProcessor(client)
+
+    for _ in range(100):
+        processor.start_span(name="fire-and-forget")
+    kept = processor.start_span(name="kept")
+    processor.flush(wait=True, timeout=5)
+    gc.collect()
+
+    # Only the span whose handle is still alive is kept by the background thread
+    assert sum(ref() is not None for ref in client.spans) == 1
+    kept_span = client.spans[-1]()
+    kept.update(output="done").end()
+    processor.flush(wait=True, timeout=5)
+    assert kept_span.updates == [{"output": "done"}]
+    assert kept_span.ended
+    processor.shutdown()
+
+
+def test_lazy_arguments_resolved_on_background_thread():
+    client = RecordingClient()
+    processor = AsyncLangfuseProcessor(client)
+
+    span = processor.start_span(name="lazy")
+    span.update(metadata=lambda: {"context": "built later"})
+    processor.flush(wait=True, timeout=5)
+
+    assert client.spans[0]().updates == [{"metadata": {"context": "built later"}}]
+    processor.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(__import__("pytest").main([__file__, "-q"]))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the WebSearchTool result cache
+No network needed: the DuckDuckGo client is replaced by a stand-in
+"""
+
+import sys
+from pathlib import Path
+
+
+# Modules import each other by flat name
+src_path = Path(__file__).parent.parent / "src" / "demo_indabax"
+sys.path.insert(0, str(src_path))
+
+
+from web_search import WebSearchTool
+
+
+class CountingDDGS:
+    """Stand-in DuckDuckGo client returning fixed results and counting calls"""
+
+    def __init__(self, results_per_query: int = 1):
+        self.calls = 0
+        self.results_per_query = results_per_query
+
+    def text(self, query, max_results):
+        self.calls += 1
+        return [{"title": query, "body": "snippet", "href": "https://example.com"}] * self.results_per_query
+
+
+def _tool(ddgs: CountingDDGS, **kwargs) -> WebSearchTool:
+    tool = WebSearchTool(**kwargs)
+    tool._local.ddgs = ddgs
+    return tool
+
+
+def test_results_are_cached():
+    ddgs = CountingDDGS()
+    tool = _tool(ddgs)
+    tool.search("weather")
+    tool.search("weather")
+    assert ddgs.calls == 1
+    tool.close()
+
+
+def test_cached_results_are_copies():
+    tool = _tool(CountingDDGS())
+    expected = [{"title": "weather", "snippet": "snippet", "link": "https://example.com"}]
+
+    first = tool.search("weather")
+    first[0]["title"] = "modified"
+    first.append({"title": "added"})
+    second = tool.search("weather")
+    second[0]["snippet"] = "modified"
+
+    assert tool.search("weather") == expected
+    tool.close()
+
+
+def test_cache_expires():
+    ddgs = CountingDDGS()
+    tool = _tool(ddgs, cache_ttl=0)
+    tool.search("weather")
+    tool.search("weather")
+    assert ddgs.calls == 2
+    tool.close()
+
+
+def test_cache_evicts_least_recently_used():
+    ddgs = CountingDDGS()
+    tool = _tool(ddgs, cache_size=1)
+    tool.search("a")
+    tool.search("b")
+    tool.search("a")
+    assert ddgs.calls == 3
+    tool.close()
+
+
+def test_empty_results_not_cached():
+    ddgs = CountingDDGS(results_per_query=0)
+    tool = _tool(ddgs)
+    assert tool.search("nothing") == []
+    tool.search("nothing")
+    assert ddgs.calls == 2
+    tool.close()
+
+
+def test_search_many_keeps_query_order():
+    tool = _tool(CountingDDGS())
+    # Cached from this thread, so the worker threads don't need their own client
+    for query in ("a", "b", "c"):
+        tool.search(query)
+    assert [results[0]["title"] for results in tool.search_many(["c", "a", "b"])] == ["c", "a", "b"]
+    tool.close()
+
+
+if __name__ == "__main__":
+    sys.exit(__import__("pytest").main([__file__, "-q"]))